@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from prompts import continuation_prompt, detail_prompt, merge_prompt
+from resilient_stream import resilient_stream
+from scheduler import AdmissionCancelled
+
+# --- 分析任务 ---
+# 每个任务 (一种模式的一份报告) 在工作线程中完成排队与流式生成，
+# 进展以 (任务 id, 事件, 数据) 的形式放入共享队列，由脚本线程统一渲染。
+# 工作线程不调用任何 Streamlit 接口，因此多个任务可以安全并行。
+#
+# 分块高清分析时 (details 为 [(方位, 图片)] 列表)，先并行完成各局部的观察，再把观察记录
+# 附在提示词后，与概览图一起流式生成最终报告。每一次调用 (各局部与最终报告) 都单独排队准入。
+#
+# 事件: queue (位次, 等待人数) / admitted (每次准入各一次) / detail (已完成块数, 总块数) /
+#       notes ([(方位, 观察记录)]) / first_token (模型) / hedge / retry / resume / data (文本片段) /
+#       done / error (异常)
+
+
+def _collect_details(details, prompts, backend, policy, emit, admission, admit, is_cancelled):
+    finished = []
+
+    def observe(label, part):
+        def start_stream(model_name, partial):
+            user_prompt = detail_prompt(prompts.user_prompt, label)
+            if partial:
+                user_prompt = continuation_prompt(user_prompt, partial)
+            return backend.stream(model_name, prompts.system_prompt, user_prompt, part)
+
+        pieces = []
+        # 每个局部都是一次独立的模型调用，各自排队、各占一个名额与一个令牌
+        with admission():
+            if not is_cancelled():
+                # 局部观察不向页面输出，重试/对冲等事件也只记录在最终报告的流上
+                stream = resilient_stream(start_stream, policy, admit=admit)
+                try:
+                    for piece in stream:
+                        if is_cancelled():
+                            break
+                        pieces.append(piece)
+                finally:
+                    stream.close()
+        finished.append(label)
+        emit("detail", (len(finished), len(details)))
+        return label, "".join(pieces)
+
+    with ThreadPoolExecutor(max_workers=len(details)) as pool:
+        return list(pool.map(lambda item: observe(*item), details))
+
+
+def run_job(job_id, prompts, image_part, events, backend, policy, scheduler, session_id,
+            queue_timeout=None, cancelled=None, details=None):
+    def emit(kind, detail=None):
+        events.put((job_id, kind, detail))
+
+    base_prompt = prompts.user_prompt
+
+    def start_stream(model_name, partial):
+        # 续写时携带已生成的部分，只请求剩余内容
+        user_prompt = continuation_prompt(base_prompt, partial) if partial else base_prompt
+        return backend.stream(model_name, prompts.system_prompt, user_prompt, image_part)
+
+    def is_cancelled():
+        return cancelled is not None and cancelled.is_set()
+
+    def admit(attempt_cancelled):
+        # 对冲、重试与续写同样消耗限速令牌，过载时不会把出站请求翻倍
+        scheduler.wait_token(cancelled=(cancelled, attempt_cancelled))
+
+    @contextmanager
+    def admission():
+        with scheduler.slot(
+            session_id, job_id,
+            on_wait=lambda position, waiting: emit("queue", (position, waiting)),
+            timeout=queue_timeout, cancelled=cancelled,
+        ):
+            emit("admitted")
+            yield
+
+    try:
+        if details:
+            notes = _collect_details(details, prompts, backend, policy, emit, admission, admit, is_cancelled)
+            emit("notes", notes)
+            base_prompt = merge_prompt(prompts.user_prompt, notes)
+        with admission():
+            # 排队期间页面可能已重跑：拿到名额后先确认，再发出任何模型请求
+            if is_cancelled():
+                return
+            stream = resilient_stream(start_stream, policy, emit, admit)
+            try:
+                for piece in stream:
+                    if is_cancelled():
+                        break
+                    emit("data", piece)
+            finally:
+                stream.close()
+        emit("done")
+    except AdmissionCancelled:
+        pass
+    except Exception as e:
+        emit("error", e)
+
+
+def start_job(*args, **kwargs):
+    thread = threading.Thread(target=run_job, args=args, kwargs=kwargs, daemon=True)
+    thread.start()
+    return thread
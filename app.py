@@ -1,8 +1,29 @@
+import time
+
+_run_started = time.perf_counter()
+
 import streamlit as st
-import google.generativeai as genai
-from PIL import Image
-import requests
 import io
+import os
+import queue
+import threading
+import uuid
+import dataclasses
+
+import config
+from startup_timing import StartupTimer, timed_import
+from upload_store import BufferPool, spool_upload
+from history import HistoryStore
+from metrics import MetricsSink, RunMetrics
+from permalinks import PermalinkStore
+from resilient_stream import StreamPolicy
+from scheduler import AdmissionRejected, AdmissionScheduler
+from report_cache import ReportCache, make_cache_key, replay_stream
+from analysis import start_job
+from backends import BACKEND_GEMINI, backend_from_config, model_id
+from prompts import MODE_COMBINED, MODE_DIAGNOSTIC, MODE_READER, build_prompts, merge_prompt, section_prompt
+from report_render import SectionedRenderer, StreamRenderer
+from sections import SectionParser, replace_section, section_specs, split_sections
 
 # --- 1. 全局配置与密钥 ---
 try:
@@ -11,7 +32,12 @@ except FileNotFoundError:
     GOOGLE_API_KEY = "请在Streamlit Secrets中配置你的KEY" 
 
 # 🛠️ 模型版本设置
-MODEL_VERSION = "gemini-3-pro-preview"
+MODEL_VERSION = config.MODEL_VERSION
+# 缓存键与档案库使用的模型标识 (本地回放后端带前缀，不与真实报告混用)
+MODEL_ID = model_id(config.MODEL_BACKEND, MODEL_VERSION)
+
+# ⏱️ 本次脚本运行的阶段计时
+startup_timer = StartupTimer(_run_started)
 
 # --- 2. 页面初始化 ---
 st.set_page_config(
@@ -26,6 +52,8 @@ if "auth_diagnostic" not in st.session_state:
     st.session_state.auth_diagnostic = False
 if "auth_reader" not in st.session_state:
     st.session_state.auth_reader = False
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # --- 4. CSS 深度视觉定制 (终极白字修正版) ---
 st.markdown("""
@@ -170,148 +198,529 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- 5. System Prompts ---
-
-PROMPT_DIAGNOSTIC = """
-# System Role: 艺术分析学者
-
-## 核心定位
-你是一个**“拼命想要读懂这幅画的全知学者”**。
-你拥有百科全书般的知识库（历史、物理、心理、认知科学、行为科学、艺术史、符号学、生物学、生理学等等），但你**不堆砌术语**。你将这些知识内化为一种**强烈的求知欲**。你通过不断的**“提问-解答”**（Self-Correction & Chain of Thought），带领读者一层层剥开画作的表象。
-
-你的语言风格应该是**通俗、流畅、具有极强的画面感和代入感**。不仅要告诉读者“有什么”，更要解释“为什么是这样”。禁止使用“不是...而是...”句式。直接断言“是什么”。多用动词。
-
----
-
-## 写作逻辑与结构 
-
-*只输出两行，精准定义。*
-
-* **原型**：（判定标准：指涉跨文化、跨时代反复出现的深层意义结构，其特征是普遍性、抽象性与心理经验的稳定性，不依赖单一文化语境。限7字以内。）
-* **意象**：（判定标准：属于特定文化与文本内部的符号单位，其意义由具体语境、历史传统与作品内部的视觉结构决定，具有特指性与语境依赖性。提取5个病灶细节。）
-
-接着，请严格按照以下**四个层级**，由远及近，由大到小，层层递进地撰写分析。这部分至少要1300字。
-
-### 第一层：时代的风暴眼 
-* **焦点**：**创作年份与地点**。
-* **思维链**：把时间轴拨回到那一年。那时候发生了什么历史大事件？那时候的空气里弥漫着什么味道（焦虑、狂欢、压抑？）当时流行什么样的思潮？
-* **核心任务**：解释这幅画为什么**必须**诞生在这个时间点？它承载了怎样的集体记忆或时代情绪？它是时代的镜子，还是时代的叛逆者？
-* **[段落注脚]**：本段主旨：（一句话概括本段阐述的时代背景与画作的必然联系）。
-
-### 第二层：画家的排兵布阵 
-* **焦点**：**构图、几何与视线**。
-* **思维链**：画家为什么要这样安排画面？为什么主要物体在左边而不是右边？是否存在某种隐藏的几何结构（螺旋、金字塔、对角线）？这是一种视觉上的引导，还是一种心理上的压迫？
-* **核心任务**：分析画面的“骨架”。这不只是美学，这是画家操控观众视线的“战术”。
-* **[段落注脚]**：本段主旨：（一句话概括画家通过构图想要达到的视觉引导或心理暗示）。
-
-### 第三层：静物 
-* **焦点**：**画中的物品/背景细节**。
-* **思维链**：不要把物体当成静止的。每一个物体都有它的过去、现在和未来。
-    * *过去*：这个物体之前遭遇了什么？为什么它会破损/崭新？
-    * *现在*：它在画面中起什么作用？它在暗示什么？
-    * *未来*：下一秒它会掉落吗？会枯萎吗？
-* **核心任务**：钻进画里，让静止的物体流动起来。挖掘物体背后的隐喻（例如：一盏将熄的灯暗示了什么？一块凌乱的地毯藏着什么秘密？）。
-* **[段落注脚]**：本段主旨：（一句话概括画中物品所承载的叙事功能或象征意义）。
-
-### 第三层：人物与关系
-* **焦点**：**人物（或拟人化的主体）**。
-* **思维链**：这是最核心的部分。对人物进行“里里外外、上上下下”的打量。
-    * *外观*：为什么穿这件衣服？（材质、阶级、时尚史）。为什么头发是乱的？
-    * *动作*：为什么手是这个姿势？他在防御还是在索取？
-    * *神情*：他的眼神看向哪里？他在回避什么？
-    * *关系*：如果有多人，他们之间的距离代表了什么？谁掌握权力？
-* **核心任务**：通过不断的**“为什么”**，推导出人物的心理状态、社会地位以及他此刻正在经历的内心风暴。
-* **[段落注脚]**：本段主旨：（一句话概括人物的心理状态或角色定位）。
-
----
-
-## 最后的总结 (The Final Insight)
-基于以上四层的层层剥离，给出一个简短有力的提问。将读者的情绪从画中拉回到现实，引发思考。
-
----
-
-## 交互指令
-请等待用户输入【艺术作品名称】+【创作年份】（可选）。
-一旦接收，立即启动“全知学者”模式，开始那场从宏观历史到微观灵魂的深度旅程。
-"""
-
-PROMPT_READER = """
-Role: 艺术侦探与文化解读者
-你是一位不仅精通艺术史，更擅长用精准、笃定的中文进行叙事的艺术解读者。你的语言风格洗练、老辣，杜绝一切廉价的口语（如“然后”、“那个”），也拒绝生硬的翻译腔。你的核心任务是挖掘画作的绝对独特性，并基于事实给出有信息增量的解读。
-
-核心思维模型：独特性光谱 (The Uniqueness Model)
-在开始写作前，请先在内心对画作进行“独特性定位”，并据此调整你的叙述策略（不要把思考过程写出来，直接体现在最终文风中）：
-
-如果是叙事型作品（如历史画、风俗画）：策略侧重于“导演视角”，聚焦瞬间的戏剧张力、人物关系的微表情、背景中潜藏的线索。
-
-如果是情绪/氛围型作品（如印象派、抽象表现主义）：策略侧重于“通感修辞”，用温度、触觉、听觉的词汇来翻译视觉色彩。
-
-如果是技法/结构型作品（如立体主义、构成主义）：策略侧重于“解剖视角”，拆解其空间逻辑、线条的暴力或秩序。
-
-严格语言禁令 (Negative Constraints)
-绝对禁止使用“不是……而是……”句式（以及类似的“非……乃……”、“与其说……不如说……”）。
-
-错误示范：这种红不是鲜艳的红，而是像血一样的暗红。
-
-正确示范：这种红像干涸的血迹一样暗沉。
-
-原则：直陈其事。只描述它是什么。
-
-拒绝万能模板。不要用“这幅画展示了……”、“通过这幅画我们可以看到……”这种套话。直接切入画面。
-
-事实洁癖。每一处关于背景、生平、隐喻的解读，必须有事实出处（可参考博物馆档案、书信集、传记）。若某处信息模糊或存疑，直接删去该部分，绝不进行“合理的猜测”或强行自圆其说。
-
-输出栏目要求 (Output Sections)
-请严格按照以下四个栏目进行撰写，内容需详实且富于变化：
-
-01. 作画的人
-溯源：用确凿的证据定位画家的身份坐标。引用他/她同时代人的评价，或他/她自己的信件原话来佐证其性格。
-
-执念：他/她这辈子最放不下的那个“母题”是什么？（例如：光线、死亡、某种特定的脸型）。
-
-此时此地：创作这幅画的具体年份，画家正处于什么样的人生境遇中？（是落魄潦倒、春风得意，还是病痛缠身？）请提供具体的传记细节，而非笼统的“创作高峰期”。
+# --- 5. 辅助函数 ---
+@st.cache_resource
+def get_image_fetcher():
+    # 进程级单例：共享连接池与磁盘 HTTP 缓存
+    image_fetch = timed_import("image_fetch")
+    return image_fetch.HttpImageFetcher(
+        os.path.join(config.CACHE_DIR, "http"),
+        max_bytes=config.FETCH_MAX_BYTES,
+        timeout=config.FETCH_TIMEOUT,
+        ttl=config.HTTP_CACHE_TTL,
+        cache_max_bytes=config.HTTP_CACHE_MAX_BYTES,
+    )
 
-02. 画里乾坤
-直击感官：根据前述的“独特性模型”定调。如果是风景，讲气温和湿度；如果是肖像，讲眼神的压迫感或闪躲。
+def load_image_from_url(url):
+    try:
+        return io.BytesIO(get_image_fetcher().fetch(url))
+    except Exception as e:
+        st.error(f"图片加载失败: {e}")
+        return None
 
-证据链：按视觉逻辑扫描画面。不要罗列物体，要描述物体之间的“张力”。
+def get_input_image(source_key, loader):
+    # ♻️ Streamlit 每次交互都会重跑脚本：暂存路径、哈希与耗时存进 session_state，
+    #    输入 (上传文件 id / URL) 不变时直接复用，侧边栏打字不会重新解码或下载
+    cached = st.session_state.get("input_image")
+    if cached and cached["key"] == source_key:
+        return cached
+
+    started = time.perf_counter()
+    source = loader()
+    if source is None:
+        st.session_state.pop("input_image", None)
+        return None
 
-显微镜：找出画面中容易被忽略的1-2个细节（角落的杂物、手指的弯曲度、反光中的倒影），并直接指出其物理形态。
+    try:
+        image_pipeline = timed_import("image_pipeline")
+        phash_index = timed_import("phash_index")
+        image_pipeline.set_pixel_limit(config.MAX_IMAGE_PIXELS, config.FULL_DECODE_MAX_PIXELS)
+        image_pipeline.set_decode_budget(config.DECODE_MEMORY_BUDGET, config.DECODE_WAIT_TIMEOUT)
+
+        # 🧠 上传内容落盘暂存，会话中不保留原始字节
+        path, digest, size = spool_upload(
+            source, os.path.join(config.CACHE_DIR, "uploads"),
+            config.UPLOAD_MAX_BYTES, config.UPLOAD_SPOOL_TTL
+        )
+        fetched = time.perf_counter()
+        entry = {
+            "key": source_key,
+            "path": path,
+            "digest": digest,
+            "size": size,
+            "dimensions": image_pipeline.image_dimensions(path),
+        }
+        # 只读文件头：超大且能在解码预算内缩小解码的图片才提供分块高清分析，并记下局部的分辨率比例
+        large = max(entry["dimensions"]) >= config.TILED_MIN_EDGE
+        entry["tile_scale"] = timed_import("tiling").tile_scale(path, config.TILED_DECODE_BUDGET) if large else None
+        # 🖼️ 一次解码生成全部预览档位，感知哈希直接基于最小一档计算
+        thumbnails = get_thumbnail_store()
+        thumbnails.ensure(digest, path)
+        entry["phash"] = phash_index.dhash(thumbnails.path(digest, thumbnails.edges[0]))
+        # 近似重复检索每个输入只做一次，重跑时直接复用结果
+        entry["similar"] = get_phash_index().lookup(entry["phash"], config.PHASH_MAX_DISTANCE)
+    except Exception as e:
+        st.error(f"图片加载失败: {e}")
+        st.session_state.pop("input_image", None)
+        return None
 
-03. 门道拆解
-技术指纹：这幅画最独特的“技术特征”是什么？是笔触的厚度？是构图的失衡？还是光线的悖论？
+    # 读取/下载与解码只在输入变化时发生一次，耗时随条目保存，由之后的第一次"启动"计入指标
+    entry["timings"] = {"fetch": fetched - started, "decode": time.perf_counter() - fetched}
+    st.session_state.input_image = entry
+    return entry
 
-去形容词化：不要说“高超的技巧”，要说“他用刮刀代替画笔堆叠出了岩石的质感”或“他故意拉长了人物的脊椎以制造不稳定性”。
+@st.cache_resource
+def get_thumbnail_store():
+    thumbnails = timed_import("thumbnails")
+    return thumbnails.ThumbnailStore(
+        os.path.join(config.CACHE_DIR, "thumbnails"), config.THUMBNAIL_EDGES, config.THUMBNAIL_TTL
+    )
 
-行业标准：用艺术行业的专业维度（如明暗对照法 Chiaroscuro、晕涂法 Sfumato、固有色与环境色关系等）来解释画面效果，解释要通俗但原理要硬核。
+@st.cache_resource
+def get_buffer_pool():
+    # 进程级单例：所有会话解码出的图片缓冲共用一个内存预算
+    return BufferPool(config.IMAGE_MEMORY_BUDGET)
+
+def get_preview(entry):
+    # 只向前端发送适合布局的那一档预览图 (编码后的 JPEG 字节)，缓冲计入进程内存预算
+    # 刷新暂存文件的 mtime，仍在使用的文件不会被过期清理
+    os.utime(entry["path"], None)
+    pool = get_buffer_pool()
+    preview = pool.get(st.session_state.session_id, "preview")
+    if preview is None or preview[0] != entry["digest"]:
+        # 缓冲已被淘汰或预览图文件缺失时，从暂存文件重建
+        thumbnails = get_thumbnail_store()
+        thumbnails.ensure(entry["digest"], entry["path"])
+        data = thumbnails.read(entry["digest"], thumbnails.pick_edge(config.PREVIEW_EDGE))
+        preview = (entry["digest"], data)
+        pool.put(st.session_state.session_id, "preview", preview, len(data))
+    return preview[1]
+
+@st.cache_resource
+def get_metrics_sink():
+    # 进程级单例：JSONL 日志 + Prometheus 文本文件
+    return MetricsSink(os.path.join(config.CACHE_DIR, "metrics"))
+
+def show_metrics_panel(run_metrics):
+    if not config.METRICS_PANEL:
+        return
+    with st.expander("性能"):
+        rows = [{"阶段": name, "耗时 (ms)": round(seconds * 1000, 1)} for name, seconds in run_metrics.spans.items()]
+        st.table(rows)
+        counters = dict(run_metrics.counters)
+        stream_seconds = run_metrics.spans.get("stream")
+        if stream_seconds and counters.get("output_chars"):
+            counters["chars_per_second"] = round(counters["output_chars"] / stream_seconds, 1)
+        if run_metrics.error:
+            counters["error"] = run_metrics.error
+        st.json(counters)
+
+@st.cache_resource
+def get_scheduler():
+    # 进程级单例：所有会话的模型调用共用同一组并发名额与令牌桶
+    return AdmissionScheduler(
+        max_concurrent=config.SCHEDULER_MAX_CONCURRENT,
+        rate_per_minute=config.SCHEDULER_RATE_PER_MINUTE,
+        burst=config.SCHEDULER_BURST,
+        max_queue=config.SCHEDULER_MAX_QUEUE,
+    )
 
-04. 看画小记
-逻辑闭环：将“作画的人”的遭遇与“画里乾坤”的细节，用一条事实逻辑线串联起来。
+def stream_policy():
+    return StreamPolicy(
+        model=MODEL_VERSION,
+        fallback_model=config.FALLBACK_MODEL,
+        first_token_timeout=config.FIRST_TOKEN_TIMEOUT,
+        idle_timeout=config.STREAM_IDLE_TIMEOUT,
+        hedge=config.HEDGE_ON_SLOW_START,
+        max_retries=config.STREAM_MAX_RETRIES,
+        backoff_base=config.STREAM_BACKOFF_BASE,
+        backoff_max=config.STREAM_BACKOFF_MAX,
+    )
 
-祛魅与评价：客观评估这幅画在画家生涯中的真实地位。它是一次完美的成功，还是一次有缺憾的实验？依据是什么？
+@st.cache_resource
+def get_backend():
+    # 进程级单例：gemini 为真实调用，fake 为本地确定性回放 (离线压测用)
+    return backend_from_config(GOOGLE_API_KEY)
+
+@st.cache_resource
+def get_report_cache():
+    # 进程级单例，所有会话共享同一个磁盘缓存
+    return ReportCache(os.path.join(config.CACHE_DIR, "reports"), config.REPORT_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_phash_index():
+    # 进程级单例：首次访问时从磁盘重建 BK-tree
+    phash_index = timed_import("phash_index")
+    return phash_index.PerceptualIndex(os.path.join(config.CACHE_DIR, "phash"))
+
+def show_similar_reports(matches):
+    # 🔍 近似重复：展示已有报告，无需调用模型
+    st.info(f"这幅作品已分析过 {len(matches)} 次，可直接查看历史报告。")
+    for match in matches[:3]:
+        label = f"{match.get('title', '')} · {match.get('artist', '')} · {match.get('mode', '')} (差异 {match['distance']})"
+        with st.expander(label):
+            st.caption(f"年份: {match.get('year', '')} · 模型: {match.get('model', '')}")
+            record = get_history_store().get(match["history_id"]) if match.get("history_id") else None
+            st.markdown(record["report"] if record else "报告记录缺失。")
+
+def show_startup_timing(stage):
+    startup_timer.mark(stage)
+    if not config.STARTUP_TIMING:
+        return
+    with st.expander("启动耗时"):
+        st.code("\n".join(startup_timer.report_lines()), language=None)
+
+@st.cache_resource
+def get_history_store():
+    # 进程级单例：SQLite 连接在线程间共享，内部加锁
+    return HistoryStore(config.HISTORY_DB)
+
+def apply_suggestion(input_key, suggest_key):
+    # 选择联想项后写回输入框 (回调在脚本重跑之前执行，可以修改控件状态)
+    choice = st.session_state.get(suggest_key)
+    if choice:
+        st.session_state[input_key] = choice
+        st.session_state[suggest_key] = ""
+
+def show_suggestions(field, typed, input_key):
+    suggestions = [item for item in get_history_store().suggest(field, typed or "") if item != typed]
+    if not suggestions:
+        return
+    suggest_key = f"suggest_{field}"
+    st.selectbox(
+        "Suggestions", [""] + suggestions, key=suggest_key,
+        on_change=apply_suggestion, args=(input_key, suggest_key),
+        format_func=lambda item: item or "历史记录联想…",
+        label_visibility="collapsed",
+    )
 
-终极定性：用一句话总结这幅画的“物理存在感”或“精神重量”，言简意赅，掷地有声。
+def show_history_browser():
+    # 🗃️ 历史档案：直接从本地数据库打开过往报告，不调用模型
+    with st.expander("历史档案"):
+        query = st.text_input("搜索历史报告", placeholder="艺术家、作品名、年份或报告中的字句", key="history_query")
+        results = get_history_store().search(query or "")
+        if not results:
+            st.caption("暂无匹配的报告。")
+            return
+        options = {
+            row["id"]: f"{row['title']} · {row['artist']} · {row['mode']} · "
+                       f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created_at']))}"
+            for row in results
+        }
+        # 默认不选中任何报告，用户挑选后才读取并渲染正文
+        selected = st.selectbox(
+            "报告", list(options), index=None, format_func=options.get,
+            placeholder="选择一份报告", key="history_selected",
+        )
+        if selected is None:
+            return
+        entry = get_history_store().get(selected)
+        if entry:
+            st.caption(f"年份: {entry['year']} · 模型: {entry['model']}")
+            st.markdown(entry["report"])
+
+@st.cache_resource
+def get_permalink_store():
+    return PermalinkStore(config.PERMALINK_DIR)
+
+def section_meta(mode, report):
+    # 报告按栏目分别保存，便于单独重写某一栏目
+    return [{"key": spec.key, "title": spec.title, "text": text} for spec, text in split_sections(mode, report)]
+
+def publish_report(view, report):
+    # 🔗 报告与预览图压缩落盘，生成可分享的 ?report=<id> 链接
+    thumbnails = get_thumbnail_store()
+    try:
+        thumbnail = thumbnails.read(view["digest"], thumbnails.pick_edge(config.PREVIEW_EDGE))
+    except OSError:
+        thumbnail = None
+    prompts = view["prompts"]
+    report_id = get_permalink_store().save(
+        report, thumbnail, view["digest"], view["mode"],
+        prompts.artist, prompts.title, prompts.year, view["model"],
+        sections=section_meta(view["mode"], report),
+    )
+    view["info"].markdown(f"🔗 分享链接：[?report={report_id}](?report={report_id})")
+
+def section_button(box, mode, spec):
+    # 启动后的本次运行与之后的重跑使用相同的标签与 key，点击才能在重跑中被识别
+    return box.button(f"重写「{spec.title}」", key=f"regen-{mode}-{spec.key}")
+
+def complete_report(view, report):
+    # 完成的报告：生成分享链接、保存到会话中，并在每个栏目下提供单独重写的按钮
+    publish_report(view, report)
+    st.session_state.setdefault("saved_reports", {})[view["mode"]] = {
+        "mode": view["mode"],
+        "prompts": view["prompts"],
+        "cache_key": view["cache_key"],
+        "digest": view["digest"],
+        "model": view["model"],
+        "report": report,
+        "history_id": view.get("history_id"),
+        "tiled": view.get("tiled", False),
+        "notes": view.get("notes"),
+    }
+    for spec, _ in view["renderer"].sections():
+        section_button(view["renderer"].boxes[spec.key], view["mode"], spec)
+
+def show_shared_report(record):
+    # 分享链接只读取已保存的文件：不调用模型、不下载原图、不导入 SDK
+    st.title("漫游艺术领读人" if record["mode"] == MODE_READER else "图解心灵讨论组")
+    st.caption(f"{record['artist']} · {record['title']} · {record['year']}")
+    if record["thumbnail"]:
+        st.image(record["thumbnail"], use_column_width=True)
+    st.divider()
+    st.markdown("### 分析报告")
+    for section in record.get("sections") or [{"text": record["report"]}]:
+        st.container().markdown(section["text"])
+    st.caption(f"模型: {record['model']} · 生成于 {time.strftime('%Y-%m-%d %H:%M', time.localtime(record['created_at']))}")
+    if st.button("开始新的分析"):
+        st.query_params.clear()
+        st.rerun()
+
+def replay_cached_report(view, entry):
+    view["info"].caption("已命中报告缓存，未调用模型。")
+    if config.REPORT_CACHE_REPLAY_STREAM:
+        for piece in replay_stream(entry["report"]):
+            view["renderer"].feed(piece)
+    else:
+        view["renderer"].feed(entry["report"])
+    view["renderer"].close()
+    view["metrics"].count("cache_hits")
+    view["model"] = entry.get("model", view["model"])
+    view["history_id"] = entry.get("history_id")
+    view["notes"] = entry.get("notes")
+    complete_report(view, entry["report"])
+
+# 尾延迟保护事件对应的计数器名
+_STREAM_COUNTERS = {"hedge": "stream_hedges", "retry": "stream_retries", "resume": "stream_resumes"}
+
+def show_job_event(view, kind, detail):
+    # 在脚本线程中处理工作线程发来的事件
+    run_metrics = view["metrics"]
+    if kind == "queue":
+        position, waiting = detail
+        view["notice"].info(f"当前使用人数较多，正在排队：第 {position} 位 (共 {waiting} 人等待)。")
+    elif kind == "admitted":
+        view["notice"].empty()
+        # 分块分析中每次调用都单独准入，排队耗时按首次准入计
+        if "request_started" not in view:
+            run_metrics.add_span("queue", time.perf_counter() - view["started"])
+            view["request_started"] = time.perf_counter()
+    elif kind == "detail":
+        done, total = detail
+        view["notice"].caption(f"正在观察高清局部：{done}/{total}")
+        if done == total:
+            run_metrics.add_span("detail", time.perf_counter() - view["request_started"])
+    elif kind == "notes":
+        # 分块分析的局部观察记录随报告保存，之后重写单个栏目时复用
+        view["notes"] = detail
+    elif kind == "first_token":
+        view["model"] = model_id(config.MODEL_BACKEND, detail)
+    elif kind == "data":
+        if not run_metrics.counters.get("chunks_received"):
+            run_metrics.add_span("first_token", time.perf_counter() - view["request_started"])
+        run_metrics.count("chunks_received")
+        run_metrics.count("output_chars", len(detail))
+        with run_metrics.span("render"):
+            view["renderer"].feed(detail)
+        if "first_render" not in run_metrics.spans:
+            # 从点击"启动"到第一段文字出现在页面上，包含预处理、排队与首字等待
+            run_metrics.add_span("first_render", time.perf_counter() - view["launched"])
+    elif kind in _STREAM_COUNTERS:
+        run_metrics.count(_STREAM_COUNTERS[kind])
+        if kind == "hedge":
+            view["notice"].caption(f"响应较慢，已同时请求备用模型 {detail}。")
+        elif kind == "retry":
+            view["notice"].caption(f"连接异常 ({detail})，正在重试…")
+        else:
+            view["notice"].caption(f"输出中断 ({detail})，正在从断点续写…")
+
+def close_job(view, error=None):
+    # 关闭渲染器并记录耗时；失败时显示提示并返回 None
+    run_metrics = view["metrics"]
+    text = view["renderer"].close()
+    if "request_started" in view:
+        run_metrics.add_span("stream", time.perf_counter() - view["request_started"])
+    if error is not None:
+        run_metrics.fail(error)
+        if isinstance(error, AdmissionRejected):
+            view["notice"].warning(str(error))
+        else:
+            view["notice"].error(f"运行时错误: {str(error)}")
+        return None
+    return text
 
-User Input: 艺术作品名称：{{Title}} 艺术家：{{Artist}} 创作年份：{{Year}}
-"""
+def drain_events(pending, events, cancelled, on_finish):
+    # 脚本线程逐个处理工作线程的事件，直到所有任务结束
+    try:
+        while pending:
+            job_id, kind, detail = events.get()
+            if kind == "done":
+                on_finish(pending.pop(job_id))
+            elif kind == "error":
+                on_finish(pending.pop(job_id), detail)
+            else:
+                show_job_event(pending[job_id], kind, detail)
+    finally:
+        # 页面重跑或中断时通知工作线程停止，释放调用名额
+        cancelled.set()
+
+def preprocess_input(input_image):
+    # 🖼️ 预处理：缩放 + 重新编码，减少上传字节数
+    # 加载图片时已生成多级预览图，够大的一档直接作为模型输入，原图不再整幅解码第二次
+    image_pipeline = timed_import("image_pipeline")
+    preprocess = image_pipeline.PreprocessConfig(
+        max_edge=config.PREPROCESS_MAX_EDGE,
+        format=config.PREPROCESS_FORMAT,
+        quality=config.PREPROCESS_QUALITY,
+    )
+    thumbnails = get_thumbnail_store()
+    edge = thumbnails.pick_edge(config.PREPROCESS_MAX_EDGE)
+    if edge < config.PREPROCESS_MAX_EDGE and max(input_image["dimensions"]) > edge:
+        return image_pipeline.preprocess_image(input_image["path"], preprocess)
+    thumbnails.ensure(input_image["digest"], input_image["path"])
+    prepared = image_pipeline.preprocess_image(thumbnails.path(input_image["digest"], edge), preprocess)
+    return dataclasses.replace(prepared, original_bytes=input_image["size"])
+
+def finish_job(view, error=None):
+    run_metrics = view["metrics"]
+    full_response = close_job(view, error)
+    if full_response is None:
+        return
+
+    prompts = view["prompts"]
+    if full_response:
+        view["history_id"] = get_history_store().add(
+            view["mode"], prompts.artist, prompts.title, prompts.year, view["model"], full_response,
+            cache_key=view["cache_key"], image_digest=view["digest"],
+            timings={name: round(seconds, 4) for name, seconds in run_metrics.spans.items()},
+        )
+        # 缓存键按主模型计算；对冲或降级时由备用模型生成的报告不写入缓存，以免之后冒充主模型的结果
+        if view["model"] == MODEL_ID:
+            get_report_cache().put(
+                view["cache_key"], full_response,
+                mode=view["mode"], artist=prompts.artist, title=prompts.title,
+                year=prompts.year, model=view["model"],
+                sections=section_meta(view["mode"], full_response),
+                history_id=view["history_id"], notes=view.get("notes"),
+            )
+        get_phash_index().add(
+            view["phash"], view["cache_key"], view["history_id"],
+            mode=view["mode"], artist=prompts.artist, title=prompts.title,
+            year=prompts.year, model=view["model"]
+        )
+        complete_report(view, full_response)
+
+def regenerate_section(entry, spec, text, slot, info, input_image):
+    # 只针对一个栏目发起请求，其余栏目保持不变
+    launched = time.perf_counter()
+    heading_line = text.split("\n", 1)[0] if spec.heading is not None else ""
+    user_prompt = section_prompt(entry["prompts"].user_prompt, entry["report"], spec.title, heading_line)
+    # 分块分析的报告：预处理后的整图即概览，附上原先的局部观察记录，不再重新观察各局部
+    keeps_details = not entry["tiled"] or bool(entry["notes"])
+    if entry["tiled"] and entry["notes"]:
+        user_prompt = merge_prompt(user_prompt, entry["notes"])
+    prompts = dataclasses.replace(entry["prompts"], user_prompt=user_prompt)
+    view = {
+        "mode": entry["mode"],
+        "launched": launched,
+        "started": launched,
+        "prompts": prompts,
+        "model": entry["model"],
+        "metrics": RunMetrics(mode=entry["mode"], model=MODEL_ID, section=spec.key, tiled=entry["tiled"]),
+        "notice": info.empty(),
+        "renderer": StreamRenderer(slot.container(), max_fps=config.RENDER_MAX_FPS, flush_chars=config.RENDER_FLUSH_CHARS),
+    }
+
+    def finish_section(view, error=None):
+        new_text = close_job(view, error)
+        if not new_text:
+            return
+        report = replace_section(entry["mode"], entry["report"], spec.key, new_text)
+        entry["report"] = report
+        original = entry["prompts"]
+        # 档案库与近似重复索引引用同一条记录，就地更新后两处都显示新报告
+        history = get_history_store()
+        if entry["history_id"]:
+            history.update_report(entry["history_id"], report)
+        else:
+            entry["history_id"] = history.add(
+                entry["mode"], original.artist, original.title, original.year, view["model"], report,
+                cache_key=entry["cache_key"], image_digest=entry["digest"],
+            )
+            get_phash_index().add(
+                input_image["phash"], entry["cache_key"], entry["history_id"],
+                mode=entry["mode"], artist=original.artist, title=original.title,
+                year=original.year, model=view["model"]
+            )
+        # 缺少局部观察记录的分块报告重写后不再等同于分块结果，不写回分块缓存键
+        if view["model"] == MODEL_ID and keeps_details:
+            get_report_cache().put(
+                entry["cache_key"], report,
+                mode=entry["mode"], artist=original.artist, title=original.title,
+                year=original.year, model=view["model"],
+                sections=section_meta(entry["mode"], report),
+                history_id=entry["history_id"], notes=entry["notes"],
+            )
+        publish_report(dict(view, prompts=original, digest=entry["digest"], info=info), report)
 
-# --- 6. 辅助函数 ---
-def load_image_from_url(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        image = Image.open(io.BytesIO(response.content))
-        return image
+        backend = get_backend()
+        image_part = preprocess_input(input_image).as_part()
     except Exception as e:
-        st.error(f"图片加载失败: {e}")
-        return None
-
-# --- 7. 侧边栏逻辑 ---
+        finish_section(view, e)
+    else:
+        events = queue.Queue()
+        cancelled = threading.Event()
+        start_job(
+            entry["mode"], prompts, image_part, events,
+            backend, stream_policy(), get_scheduler(), st.session_state.session_id,
+            queue_timeout=config.SCHEDULER_MAX_WAIT, cancelled=cancelled,
+        )
+        drain_events({entry["mode"]: view}, events, cancelled, finish_section)
+    get_metrics_sink().record(view["metrics"])
+
+def show_saved_reports(input_image):
+    # 本会话中完成的报告在之后的重跑中继续显示，每个栏目可单独重写
+    saved = [
+        entry for entry in st.session_state.get("saved_reports", {}).values()
+        if entry["digest"] == input_image["digest"]
+    ]
+    if not saved:
+        return
+    st.divider()
+    st.markdown("### 分析报告")
+    if len(saved) > 1:
+        areas = dict(zip([entry["mode"] for entry in saved], st.tabs([entry["mode"] for entry in saved])))
+    else:
+        areas = {saved[0]["mode"]: st.container()}
+    for entry in saved:
+        with areas[entry["mode"]]:
+            info = st.container()
+            for spec, text in split_sections(entry["mode"], entry["report"]):
+                box = st.container()
+                slot = box.empty()
+                slot.markdown(text)
+                if section_button(box, entry["mode"], spec):
+                    regenerate_section(entry, spec, text, slot, info, input_image)
+
+# --- 分享链接：?report=<id> 直接展示已保存的报告，跳过鉴权与生成流程 ---
+shared_report_id = st.query_params.get("report")
+if shared_report_id:
+    shared_record = get_permalink_store().load(shared_report_id)
+    if shared_record:
+        show_shared_report(shared_record)
+        show_startup_timing("shared_report")
+        st.stop()
+    st.warning("分享链接无效或报告已不存在。")
+
+# --- 6. 侧边栏逻辑 ---
 with st.sidebar:
     st.markdown("### 模式选择")
     mode = st.radio(
         "Select Mode",
-        ["图解心灵讨论组", "漫游艺术领读人"], 
+        [MODE_DIAGNOSTIC, MODE_READER, MODE_COMBINED], 
         label_visibility="collapsed"
     )
     
@@ -319,9 +728,11 @@ with st.sidebar:
     
     # 鉴权状态判断
     is_unlocked = False
-    if mode == "图解心灵讨论组" and st.session_state.auth_diagnostic:
+    if mode == MODE_DIAGNOSTIC and st.session_state.auth_diagnostic:
         is_unlocked = True
-    elif mode == "漫游艺术领读人" and st.session_state.auth_reader:
+    elif mode == MODE_READER and st.session_state.auth_reader:
+        is_unlocked = True
+    elif mode == MODE_COMBINED and st.session_state.auth_diagnostic and st.session_state.auth_reader:
         is_unlocked = True
     
     # 全局禁用开关
@@ -343,6 +754,8 @@ with st.sidebar:
             st.text_input("Artist", value="未知", disabled=True, label_visibility="collapsed", key="input_artist_dis")
         else:
             artist_name = st.text_input("Artist", placeholder="如: 弗朗西斯·培根", disabled=artist_disabled, label_visibility="collapsed", key="input_artist")
+            if not artist_disabled:
+                show_suggestions("artist", artist_name, "input_artist")
 
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -350,7 +763,9 @@ with st.sidebar:
     st.caption("作品名称")
     col_t1, col_t2 = st.columns([3, 1])
     with col_t1:
-         artwork_title = st.text_input("Title", placeholder="如: 肖像习作", disabled=global_disable, label_visibility="collapsed")
+         artwork_title = st.text_input("Title", placeholder="如: 肖像习作", disabled=global_disable, label_visibility="collapsed", key="input_title")
+         if not global_disable:
+             show_suggestions("title", artwork_title, "input_title")
     with col_t2:
         st.empty()
 
@@ -379,13 +794,15 @@ with st.sidebar:
     st.text_input("Auth", value=status_val, disabled=True, label_visibility="collapsed")
 
 
-# --- 8. 主界面逻辑 ---
+# --- 7. 主界面逻辑 ---
 
 # 动态标题逻辑
-if mode == "图解心灵讨论组":
+if mode == MODE_DIAGNOSTIC:
     st.title("图解心灵讨论组")
-else:
+elif mode == MODE_READER:
     st.title("漫游艺术领读人")
+else:
+    st.title("双线并行")
 
 # 鉴权逻辑分支
 if not is_unlocked:
@@ -394,20 +811,29 @@ if not is_unlocked:
     st.markdown("### 权限验证")
     
     # 纯白提示语
-    current_mode_text = mode if mode == '漫游艺术领读人' else '图解心灵讨论组'
-    st.markdown(f"您正在尝试访问 **{current_mode_text}**，请输入访问密钥。")
+    if mode == MODE_COMBINED:
+        # 并行模式需要两个模式的密钥，逐个输入
+        missing = [name for name, ok in (
+            (MODE_DIAGNOSTIC, st.session_state.auth_diagnostic),
+            (MODE_READER, st.session_state.auth_reader),
+        ) if not ok]
+        st.markdown(f"**双线并行** 需要同时解锁两个模式，尚未解锁：**{'、'.join(missing)}**。")
+    else:
+        current_mode_text = mode if mode == '漫游艺术领读人' else '图解心灵讨论组'
+        st.markdown(f"您正在尝试访问 **{current_mode_text}**，请输入访问密钥。")
     
     password_input = st.text_input("输入密钥", type="password", key="pwd_input")
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     unlock_btn = st.button("解锁终端")
+    show_startup_timing("lock_screen")
     
     if unlock_btn:
-        if mode == "图解心灵讨论组" and password_input == "0006":
+        if mode in (MODE_DIAGNOSTIC, MODE_COMBINED) and password_input == "0006":
             st.session_state.auth_diagnostic = True
             st.rerun()
-        elif mode == "漫游艺术领读人" and password_input == "4666":
+        elif mode in (MODE_READER, MODE_COMBINED) and password_input == "4666":
             st.session_state.auth_reader = True
             st.rerun()
         else:
@@ -420,21 +846,59 @@ else:
     st.markdown("#### 艺术作品上传")
     
     tab1, tab2 = st.tabs(["本地上传", "网络链接"])
-    uploaded_image = None
+    input_image = None
 
     with tab1:
         file = st.file_uploader("选择文件", type=["jpg", "jpeg", "png"], label_visibility="collapsed")
-        if file:
-            uploaded_image = Image.open(file)
 
     with tab2:
         url = st.text_input("粘贴图片 URL", label_visibility="collapsed", placeholder="http://...")
-        if url:
-            uploaded_image = load_image_from_url(url)
+
+    # 两处都有输入时以网络链接为准
+    if url:
+        input_image = get_input_image(("url", url), lambda: load_image_from_url(url))
+    elif file:
+        file_key = getattr(file, "file_id", None) or f"{file.name}:{file.size}"
+        def read_upload():
+            file.seek(0)
+            return file
+        input_image = get_input_image(("file", file_key), read_upload)
+    else:
+        st.session_state.pop("input_image", None)
 
     # 图片预览
-    if uploaded_image:
-        st.image(uploaded_image, use_column_width=True)
+    use_tiles = False
+    if input_image:
+        try:
+            st.image(get_preview(input_image), use_column_width=True)
+            # 展开后显示最大一档预览图；原图不在页面上解码，只提供下载
+            if st.checkbox("查看原图", key="show_original"):
+                thumbnails = get_thumbnail_store()
+                st.image(thumbnails.read(input_image["digest"], thumbnails.edges[-1]), use_column_width=True)
+                width, height = input_image["dimensions"]
+                with open(input_image["path"], "rb") as f:
+                    st.download_button(
+                        f"下载原图 ({width}×{height}, {input_image['size'] / 1e6:.1f} MB)", f,
+                        file_name=f"original-{input_image['digest'][:12]}",
+                        key="download_original",
+                    )
+        except OSError:
+            # 暂存文件已过期被清理
+            st.session_state.pop("input_image", None)
+            st.warning("图片暂存已过期，请重新上传。")
+            st.stop()
+
+        if input_image["similar"]:
+            show_similar_reports(input_image["similar"])
+
+        # 🧩 超高分辨率扫描图：概览 + 细节最密集的几个高清局部
+        if input_image["tile_scale"]:
+            scale = input_image["tile_scale"]
+            detail = "原图分辨率" if scale >= 1 else f"约原图分辨率的 {scale:.0%} (受解码内存预算限制)"
+            use_tiles = st.checkbox(
+                "分块高清分析",
+                help=f"额外发送 {config.TILED_MAX_TILES} 个高分辨率局部 ({detail})，耗时与调用量相应增加",
+            )
     else:
         st.markdown("""
         <div style="background-color: #111111; height: 150px; display: flex; align-items: center; justify-content: center; color: #555555; border: 1px dashed #333333; margin-top: 10px; font-size: 0.8rem;">
@@ -442,91 +906,138 @@ else:
         </div>
         """, unsafe_allow_html=True)
 
+    show_history_browser()
+    show_startup_timing("upload_screen")
     st.markdown("<br>", unsafe_allow_html=True)
 
     # 执行按钮 (白底黑字)
     if st.button("启动"):
-        if not GOOGLE_API_KEY or "配置" in GOOGLE_API_KEY:
+        launched = time.perf_counter()
+        if config.MODEL_BACKEND == BACKEND_GEMINI and (not GOOGLE_API_KEY or "配置" in GOOGLE_API_KEY):
             st.error("系统错误: API Key 无效或未配置。")
             st.stop()
         
-        if not uploaded_image:
+        if not input_image:
             st.warning("请先上传图片或输入图片链接。")
             st.stop()
 
-        # 配置 API
-        genai.configure(api_key=GOOGLE_API_KEY)
-        
-        current_title = artwork_title if artwork_title else "未知作品"
-        current_artist = artist_name if artist_name else "未知艺术家"
-        current_year = artwork_year if artwork_year else "未知年份"
-
-        # --- 指令分发 ---
-        if mode == "图解心灵讨论组":
-            # 诊断间逻辑
-            dynamic_instructions = ""
-            if unknown_artist:
-                dynamic_instructions += "\n⚠️ 艺术家身份未知，请忽略背景分析，强制执行盲测模式。"
-            if unknown_year:
-                dynamic_instructions += "\n⚠️ 创作年份未知，请跳过宏观历史分析，仅推测可能的年代感。"
-
-            # 🛠️ 核心修复：在 User Prompt 中强制注入元数据，防止 AI 忽视输入
-            user_prompt_content = f"""
-            [绝对事实/GROUND TRUTH]
-            请务必以以下元数据为准，不要基于视觉相似性猜测其他艺术家。
-            
-            艺术家: {current_artist}
-            作品名: {current_title}
-            年份: {current_year}
-            
-            {dynamic_instructions}
-            
-            请基于 System Instruction 中的角色设定，对这张图片进行深度分析。
-            """
-            
-            final_system_prompt = PROMPT_DIAGNOSTIC
+        job_modes = [MODE_DIAGNOSTIC, MODE_READER] if mode == MODE_COMBINED else [mode]
 
-        else:
-            # 领读人逻辑
-            
-            # 1. 替换 System Prompt 中的占位符 (双重保险)
-            final_system_prompt = PROMPT_READER.replace("{{Title}}", current_title)
-            final_system_prompt = final_system_prompt.replace("{{Artist}}", current_artist)
-            final_system_prompt = final_system_prompt.replace("{{Year}}", current_year)
-            
-            # 🛠️ 核心修复：在 User Prompt 中也强制注入元数据，因为 Gemini 更听从 User Prompt
-            user_prompt_content = f"""
-            请针对以下作品开始解读：
-            艺术家：{current_artist}
-            作品名：{current_title}
-            年份：{current_year}
-
-            请严格基于上述信息进行分析，不要质疑或更改艺术家身份。
-            """
-
-        # AI 生成与流式输出
+        # AI 生成与流式输出：每个模式一份报告，并行模式下各占一个标签页
         st.divider()
         st.markdown("### 分析报告")
-        report_placeholder = st.empty()
-        full_response = ""
-
-        try:
-            model = genai.GenerativeModel(
-                model_name=MODEL_VERSION,
-                system_instruction=final_system_prompt
+        if len(job_modes) > 1:
+            areas = dict(zip(job_modes, st.tabs(job_modes)))
+        else:
+            areas = {mode: st.container()}
+
+        # 读取/下载与解码只发生在加载图片时，耗时只随之后的第一次启动计入一次指标
+        load_timings = input_image.pop("timings", None) or {}
+        views = {}
+        for job_mode in job_modes:
+            prompts = build_prompts(
+                job_mode, artist_name, artwork_title, artwork_year, unknown_artist, unknown_year,
+                static_system=config.READER_STATIC_SYSTEM_PROMPT
             )
-            
-            response_stream = model.generate_content(
-                [user_prompt_content, uploaded_image],
-                stream=True
+            # 🗂️ 报告缓存：同一张图 + 同一组元数据 + 同一模式，直接回放
+            # 分块分析的报告与普通报告分开缓存
+            cache_key = make_cache_key(
+                input_image["digest"], prompts.artist, prompts.title, prompts.year,
+                f"{job_mode}·分块" if use_tiles else job_mode, prompts.template, MODEL_ID
             )
-            
-            for chunk in response_stream:
-                if chunk.text:
-                    full_response += chunk.text
-                    report_placeholder.markdown(full_response + "▌")
-            
-            report_placeholder.markdown(full_response)
-
-        except Exception as e:
-            st.error(f"运行时错误: {str(e)}")
+            # 📊 本次运行的阶段耗时与计数器
+            run_metrics = RunMetrics(mode=job_mode, model=MODEL_ID, tiled=use_tiles)
+            for stage, seconds in load_timings.items():
+                run_metrics.add_span(stage, seconds)
+            load_timings = {}
+
+            with areas[job_mode]:
+                info_area = st.container()
+                views[job_mode] = {
+                    "mode": job_mode,
+                    "launched": launched,
+                    "prompts": prompts,
+                    "cache_key": cache_key,
+                    "phash": input_image["phash"],
+                    "digest": input_image["digest"],
+                    "model": MODEL_ID,
+                    "tiled": use_tiles,
+                    "metrics": run_metrics,
+                    "info": info_area,
+                    "notice": info_area.empty(),
+                    # 按栏目解析流式输出，每个栏目渲染到各自的容器中
+                    "renderer": SectionedRenderer(
+                        st.container(),
+                        SectionParser(section_specs(job_mode)),
+                        max_fps=config.RENDER_MAX_FPS,
+                        flush_chars=config.RENDER_FLUSH_CHARS,
+                    ),
+                }
+
+        pending = {}
+        for job_mode, view in views.items():
+            cached_entry = get_report_cache().get(view["cache_key"])
+            if cached_entry:
+                replay_cached_report(view, cached_entry)
+            else:
+                pending[job_mode] = view
+
+        if pending:
+            try:
+                # 模型后端 (进程内只创建一次)，Gemini SDK 在此时才导入
+                backend = get_backend()
+
+                # 🖼️ 预处理：缩放 + 重新编码，减少上传字节数 (并行模式下只做一次)
+                encode_started = time.perf_counter()
+                details = None
+                if use_tiles:
+                    tiling = timed_import("tiling")
+                    overview, tiles = tiling.build_tiles(
+                        input_image["path"], config.TILED_MAX_TILES, config.TILED_TILE_EDGE,
+                        config.TILED_DECODE_BUDGET, config.PREPROCESS_MAX_EDGE,
+                    )
+                    image_part = {"mime_type": "image/jpeg", "data": overview}
+                    details = [(tile.label, tile.as_part()) for tile in tiles]
+                    sent_bytes = len(overview) + sum(len(tile.data) for tile in tiles)
+                    image_caption = (
+                        f"分块高清分析: 概览 + {len(tiles)} 个局部 "
+                        f"({'、'.join(tile.label for tile in tiles)})，共 {sent_bytes / 1024:.0f} KB"
+                    )
+                else:
+                    prepared_image = preprocess_input(input_image)
+                    image_part = prepared_image.as_part()
+                    sent_bytes = prepared_image.sent_bytes
+                    image_caption = (
+                        f"影像已压缩: {prepared_image.original_bytes / 1024:.0f} KB → "
+                        f"{prepared_image.sent_bytes / 1024:.0f} KB "
+                        f"({prepared_image.size[0]}×{prepared_image.size[1]})"
+                    )
+                encode_seconds = time.perf_counter() - encode_started
+            except Exception as e:
+                for view in pending.values():
+                    finish_job(view, e)
+                pending = {}
+
+        if pending:
+            # 🚦 各任务在工作线程中排队与生成，脚本线程只负责渲染
+            events = queue.Queue()
+            cancelled = threading.Event()
+            for job_mode, view in pending.items():
+                view["metrics"].add_span("encode", encode_seconds)
+                view["metrics"].count("bytes_sent", sent_bytes)
+                view["info"].caption(image_caption)
+                view["started"] = time.perf_counter()
+                start_job(
+                    job_mode, view["prompts"], image_part, events,
+                    backend, stream_policy(), get_scheduler(), st.session_state.session_id,
+                    queue_timeout=config.SCHEDULER_MAX_WAIT, cancelled=cancelled, details=details,
+                )
+
+            drain_events(pending, events, cancelled, finish_job)
+
+        for view in views.values():
+            get_metrics_sink().record(view["metrics"])
+            show_metrics_panel(view["metrics"])
+
+    elif input_image:
+        show_saved_reports(input_image)
@@ -0,0 +1,151 @@
+import glob
+import hashlib
+import os
+import re
+import time
+
+import config
+from prompts import is_static_system_prompt
+from startup_timing import timed_import
+
+# --- 模型后端 ---
+# 所有生成都经由 backend.stream(模型, System Prompt, User Prompt, 图片) 逐段产出文本，
+# 界面、批处理与分析任务不直接依赖任何 SDK。
+#   gemini: 真实调用，SDK 在创建后端时才导入；
+#   fake:   本地确定性回放预置报告，首字延迟、分块大小与速率可调，用于离线压测与测量应用自身开销。
+
+BACKEND_GEMINI = "gemini"
+BACKEND_FAKE = "fake"
+
+
+def model_id(backend_name, model_name):
+    # 报告缓存与档案库中记录的模型标识；非真实后端加前缀，回放内容不会混入真实报告
+    return model_name if backend_name == BACKEND_GEMINI else f"{backend_name}/{model_name}"
+
+
+class GeminiBackend:
+    name = BACKEND_GEMINI
+
+    def __init__(self, api_key, context_cache=False, context_cache_ttl=3600):
+        self._client = timed_import("gemini_client")
+        self._client.configure(api_key)
+        self.context_cache = context_cache
+        self.context_cache_ttl = context_cache_ttl
+
+    def stream(self, model_name, system_prompt, user_prompt, image_part):
+        # 注入了作品信息的 System Prompt 每幅作品都不同，放进上下文缓存只会为每幅作品新建一份计费的缓存
+        return self._client.stream_text(
+            model_name, system_prompt, [user_prompt, image_part],
+            context_cache=self.context_cache and is_static_system_prompt(system_prompt),
+            context_cache_ttl=self.context_cache_ttl,
+        )
+
+
+_FAKE_DIAGNOSTIC = """* **原型**：囚笼中的凝视
+* **意象**：半开的窗、熄灭的烛台、倾斜的桌面、褪色的挂毯、攥紧的左手
+
+### 第一层：时代的风暴眼
+那一年，城市刚从一场漫长的瘟疫中缓过气来，空气里还残留着焚烧衣物的焦味。画面中压低的天光与拥挤的室内，正是这种劫后余生的集体情绪。
+* **[段落注脚]**：本段主旨：画作把时代的惊惧压缩进一间屋子。
+
+### 第二层：画家的排兵布阵
+主体被推到画面左侧三分线上，一条从右下角升起的对角线把视线引向窗口。为什么要让人物背离光源？因为画家要让观众先看到出口，再看到不肯离开的人。
+* **[段落注脚]**：本段主旨：构图用对角线制造逃离与滞留的拉扯。
+
+### 第三层：静物
+烛台刚刚熄灭，烛芯还在冒烟。它的过去是一整夜的守候，它的现在是画面里唯一的时间刻度，它的未来是下一秒被收走。
+* **[段落注脚]**：本段主旨：静物替人物记录了那个无眠的夜晚。
+
+### 第三层：人物与关系
+人物的左手攥着衣角，右手却平放在桌上。为什么一只手在防御、另一只手在示弱？这是一个在体面与崩溃之间反复拉锯的人。
+* **[段落注脚]**：本段主旨：人物的身体暴露了他不愿承认的恐惧。
+
+## 最后的总结 (The Final Insight)
+当窗开着而你仍然坐着，困住你的究竟是屋子，还是你自己？
+"""
+
+_FAKE_READER = """01. 作画的人
+画家在同时代人的书信里被称作"沉默的抄写员"。他一生反复描绘同一扇朝北的窗，直到晚年视力衰退。创作这幅画的那一年，他刚刚失去第二个孩子，画室的租约也即将到期。
+
+02. 画里乾坤
+画面的温度很低，像清晨六点还没生火的屋子。光从左上方斜切进来，停在人物的指节上。角落里一只翻倒的陶杯，杯沿的裂口朝向观众。
+
+03. 门道拆解
+他用极薄的半透明罩染层层叠加，让墙面的灰色里透出暖调的底色。明暗对照法在这里被压到最克制的程度，最亮处只占画面的一小块。
+
+04. 看画小记
+丧子之痛与那只翻倒的陶杯，被同一道冷光串联起来。这幅画算不上他技术上最完美的作品，却是情感上最诚实的一幅。一间屋子，装下了一个人全部的沉默。
+"""
+
+_FAKE_DETAIL = """* 笔触短促而密集，颜料层较薄，局部可见底色。
+* 边缘处有明显的刮擦痕迹，像是画家刻意削弱了轮廓。
+* 暗部并非纯黑，混入了少量深绿与赭石。
+"""
+
+_FAKE_REWRITE = """重写后的栏目：视线先落在最亮的那一小块上，再沿着桌沿滑向阴影。画家把叙事藏进了这段距离里。
+"""
+# 重写单个栏目时，提示词中给出的原标题行
+_REWRITE_HEADING = re.compile(r"以原标题行「(.+?)」开头")
+
+
+class FakeBackend:
+    name = BACKEND_FAKE
+
+    def __init__(self, first_token_latency=0.8, chunk_chars=24, chunks_per_second=40.0, reports_dir=None):
+        self.first_token_latency = first_token_latency
+        self.chunk_chars = max(1, chunk_chars)
+        self.chunks_per_second = chunks_per_second
+        # 可选：目录中的 *.md 作为回放素材，按请求内容的哈希确定性地选取
+        self._reports = []
+        if reports_dir:
+            for path in sorted(glob.glob(os.path.join(reports_dir, "*.md"))):
+                with open(path, encoding="utf-8") as f:
+                    self._reports.append(f.read())
+
+    def report_for(self, system_prompt, user_prompt, image_part):
+        if "[局部细节/DETAIL]" in user_prompt:
+            return _FAKE_DETAIL
+        if "[重写栏目/REWRITE SECTION]" in user_prompt:
+            heading = _REWRITE_HEADING.search(user_prompt)
+            return f"{heading.group(1)}\n{_FAKE_REWRITE}" if heading else _FAKE_REWRITE
+        if self._reports:
+            digest = hashlib.sha256()
+            digest.update(system_prompt.encode("utf-8"))
+            digest.update(user_prompt.encode("utf-8"))
+            digest.update(image_part["data"])
+            return self._reports[int(digest.hexdigest(), 16) % len(self._reports)]
+        return _FAKE_READER if "01. 作画的人" in system_prompt else _FAKE_DIAGNOSTIC
+
+    def stream(self, model_name, system_prompt, user_prompt, image_part):
+        text = self.report_for(system_prompt, user_prompt, image_part)
+        interval = 1.0 / self.chunks_per_second if self.chunks_per_second > 0 else 0.0
+        time.sleep(self.first_token_latency)
+        for index, start in enumerate(range(0, len(text), self.chunk_chars)):
+            if index and interval:
+                time.sleep(interval)
+            yield text[start:start + self.chunk_chars]
+
+
+def create_backend(name, api_key=None, **options):
+    """按名称创建后端；options 传给对应后端的构造函数。"""
+    if name == BACKEND_GEMINI:
+        return GeminiBackend(api_key, **options)
+    if name == BACKEND_FAKE:
+        return FakeBackend(**options)
+    raise ValueError(f"未知的模型后端: {name}")
+
+
+def backend_from_config(api_key=None):
+    """按 config 中的设置创建后端，界面与批处理共用。"""
+    if config.MODEL_BACKEND == BACKEND_FAKE:
+        return FakeBackend(
+            first_token_latency=config.FAKE_FIRST_TOKEN_LATENCY,
+            chunk_chars=config.FAKE_CHUNK_CHARS,
+            chunks_per_second=config.FAKE_CHUNKS_PER_SECOND,
+            reports_dir=config.FAKE_REPORTS_DIR or None,
+        )
+    return create_backend(
+        config.MODEL_BACKEND, api_key,
+        context_cache=config.GEMINI_CONTEXT_CACHE,
+        context_cache_ttl=config.GEMINI_CONTEXT_CACHE_TTL,
+    )
@@ -0,0 +1,266 @@
+"""批量分析命令行。
+
+用法:
+    python batch.py catalog.csv --output results.jsonl --workers 4 --rpm 20
+
+目录文件为 CSV 或 JSONL，字段: image (本地路径或 URL，相对路径相对于目录文件所在目录), artist, title, year, mode。
+artist / year 留空或填 "未知" 时按未知处理；mode 可填界面上的模式名，或 diagnostic / reader。
+结果逐条追加写入 JSONL，中断后重新运行同一命令会跳过已完成的条目。
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+from backends import BACKEND_GEMINI, backend_from_config, model_id
+from image_fetch import HttpImageFetcher
+from image_pipeline import PreprocessConfig, preprocess_image, set_decode_budget, set_pixel_limit
+from prompts import MODE_DIAGNOSTIC, MODE_READER, build_prompts, continuation_prompt
+from report_cache import ReportCache, hash_bytes, make_cache_key
+from resilient_stream import StreamPolicy, resilient_stream
+
+_MODE_ALIASES = {
+    "diagnostic": MODE_DIAGNOSTIC,
+    "reader": MODE_READER,
+    MODE_DIAGNOSTIC: MODE_DIAGNOSTIC,
+    MODE_READER: MODE_READER,
+}
+_UNKNOWN = ("", "未知", "unknown")
+
+
+class RateLimiter:
+    """每分钟请求数上限，各线程按固定间隔依次放行。"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_catalog(path):
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    return rows
+
+
+def _field(row, key):
+    # JSONL 中的年份等字段可能是数字，统一按文本处理
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def job_id(row):
+    raw = json.dumps(
+        [row.get(k, "") for k in ("image", "artist", "title", "year", "mode")],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def finished_ids(output_path):
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 被中断时可能留下半行
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def open_for_append(output_path):
+    # 上次被中断时可能留下不带换行的半行，先补上换行，免得续跑的第一条记录接在它后面
+    out = open(output_path, "a", encoding="utf-8")
+    if out.tell() > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                out.write("\n")
+                out.flush()
+    return out
+
+
+class Runner:
+    def __init__(self, args, backend):
+        self.args = args
+        self.backend = backend
+        self.model_id = model_id(backend.name, config.MODEL_VERSION)
+        self.limiter = RateLimiter(args.rpm)
+        self.fetcher = HttpImageFetcher(
+            os.path.join(config.CACHE_DIR, "http"),
+            max_bytes=config.FETCH_MAX_BYTES,
+            timeout=config.FETCH_TIMEOUT,
+            ttl=config.HTTP_CACHE_TTL,
+            cache_max_bytes=config.HTTP_CACHE_MAX_BYTES,
+        )
+        self.report_cache = ReportCache(os.path.join(config.CACHE_DIR, "reports"), config.REPORT_CACHE_MAX_BYTES)
+        set_pixel_limit(config.MAX_IMAGE_PIXELS, config.FULL_DECODE_MAX_PIXELS)
+        set_decode_budget(config.DECODE_MEMORY_BUDGET, config.DECODE_WAIT_TIMEOUT)
+        self.preprocess = PreprocessConfig(
+            max_edge=config.PREPROCESS_MAX_EDGE,
+            format=config.PREPROCESS_FORMAT,
+            quality=config.PREPROCESS_QUALITY,
+        )
+        self.policy = StreamPolicy(
+            model=config.MODEL_VERSION,
+            fallback_model=config.FALLBACK_MODEL,
+            first_token_timeout=config.FIRST_TOKEN_TIMEOUT,
+            idle_timeout=config.STREAM_IDLE_TIMEOUT,
+            hedge=config.HEDGE_ON_SLOW_START,
+            max_retries=config.STREAM_MAX_RETRIES,
+            backoff_base=config.STREAM_BACKOFF_BASE,
+            backoff_max=config.STREAM_BACKOFF_MAX,
+        )
+        self._write_lock = threading.Lock()
+        self._out = open_for_append(args.output)
+
+    def close(self):
+        self._out.close()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._write_lock:
+            self._out.write(line + "\n")
+            self._out.flush()
+            os.fsync(self._out.fileno())
+
+    def load_image(self, ref):
+        if ref.startswith(("http://", "https://")):
+            return self.fetcher.fetch(ref)
+        # 相对路径相对于目录文件所在的目录，而不是当前工作目录
+        path = os.path.join(os.path.dirname(os.path.abspath(self.args.catalog)), os.path.expanduser(ref))
+        with open(path, "rb") as f:
+            return f.read()
+
+    def run_job(self, row):
+        mode = _MODE_ALIASES.get(_field(row, "mode"))
+        if mode is None:
+            raise ValueError(f"未知模式: {row.get('mode')!r}")
+
+        artist = _field(row, "artist")
+        year = _field(row, "year")
+        unknown_artist = artist.lower() in _UNKNOWN
+        unknown_year = year.lower() in _UNKNOWN
+        prompts = build_prompts(
+            mode,
+            "未知" if unknown_artist else artist,
+            _field(row, "title"),
+            "未知" if unknown_year else year,
+            unknown_artist,
+            unknown_year,
+            static_system=config.READER_STATIC_SYSTEM_PROMPT,
+        )
+
+        image_bytes = self.load_image(_field(row, "image"))
+        cache_key = make_cache_key(
+            hash_bytes(image_bytes), prompts.artist, prompts.title, prompts.year,
+            mode, prompts.template, self.model_id
+        )
+        cached_entry = self.report_cache.get(cache_key)
+        if cached_entry:
+            return cached_entry["report"], True, cached_entry.get("model", self.model_id)
+
+        image_part = preprocess_image(image_bytes, self.preprocess).as_part()
+
+        def start_stream(model_name, partial):
+            # 重试、对冲与续写都是新的请求，同样受限速器约束
+            self.limiter.wait()
+            user_prompt = continuation_prompt(prompts.user_prompt, partial) if partial else prompts.user_prompt
+            return self.backend.stream(model_name, prompts.system_prompt, user_prompt, image_part)
+
+        # 记录实际出字的模型：对冲或降级时可能是备用模型
+        winner = [config.MODEL_VERSION]
+
+        def on_event(kind, detail=None):
+            if kind == "first_token":
+                winner[0] = detail
+
+        report = "".join(resilient_stream(start_stream, self.policy, on_event))
+        used_model = model_id(self.backend.name, winner[0])
+        # 缓存键按主模型计算，备用模型生成的报告不写入缓存
+        if report and used_model == self.model_id:
+            self.report_cache.put(
+                cache_key, report,
+                mode=mode, artist=prompts.artist, title=prompts.title,
+                year=prompts.year, model=used_model
+            )
+        return report, False, used_model
+
+    def process(self, row):
+        record = {"id": job_id(row), **{k: row.get(k, "") for k in ("image", "artist", "title", "year", "mode")}}
+        started = time.monotonic()
+        try:
+            report, cached, used_model = self.run_job(row)
+            record.update(status="ok", report=report, cached=cached, model=used_model)
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record["elapsed"] = round(time.monotonic() - started, 3)
+        self.write(record)
+        return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成艺术作品分析报告")
+    parser.add_argument("catalog", help="CSV 或 JSONL 目录文件")
+    parser.add_argument("--output", default="batch_results.jsonl", help="结果输出 (追加写入的 JSONL)")
+    parser.add_argument("--workers", type=int, default=4, help="并发线程数")
+    parser.add_argument("--rpm", type=float, default=20, help="每分钟最多请求数 (0 为不限)")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if config.MODEL_BACKEND == BACKEND_GEMINI and not api_key:
+        print("系统错误: 请设置环境变量 GOOGLE_API_KEY。", file=sys.stderr)
+        return 2
+    backend = backend_from_config(api_key)
+
+    rows = read_catalog(args.catalog)
+    done = finished_ids(args.output)
+    pending = [row for row in rows if job_id(row) not in done]
+    print(f"共 {len(rows)} 条，已完成 {len(rows) - len(pending)} 条，待处理 {len(pending)} 条。")
+
+    runner = Runner(args, backend)
+    failures = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = [pool.submit(runner.process, row) for row in pending]
+            for index, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                if record["status"] != "ok":
+                    failures += 1
+                print(f"[{index}/{len(pending)}] {record['status']} {record['title'] or record['image']}")
+    finally:
+        runner.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""并发会话压测。
+
+用法:
+    python bench.py --users 8 --reports 3 --mode reader --output bench_results.jsonl
+
+在同一进程内用 Streamlit AppTest 模拟 N 个并发会话，每个会话走完整流程：
+解锁 → 粘贴图片链接 (本地 HTTP 服务提供的测试图) → 填写档案 → 启动 → 流式输出。
+模型固定使用本地 fake 后端，首字延迟与输出速率可调，测到的是应用自身的开销与并发容量。
+每次运行汇总为一行 JSON 追加写入结果文件，便于跨版本比较：
+重跑延迟分位数、每会话内存增量、首字渲染时间、持续吞吐 (每分钟报告数)。
+"""
+
+import argparse
+import functools
+import http.server
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+# 各模式的解锁密钥，与 app.py 的锁屏逻辑一致
+_PASSWORDS = {"diagnostic": ["0006"], "reader": ["4666"], "combined": ["0006", "4666"]}
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": round(pick(0.50), 4),
+        "p90": round(pick(0.90), 4),
+        "p99": round(pick(0.99), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def current_rss():
+    # Linux 读 /proc，其他平台退回进程峰值 (ru_maxrss 在 macOS 上以字节计)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """后台线程定时采样常驻内存，记录峰值。"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def make_images(root, users, edge):
+    # 每个会话一张内容不同的噪声图，避免上传暂存、预览图与感知哈希在会话之间共享
+    from PIL import Image
+
+    paths = []
+    for index in range(users):
+        image = Image.effect_noise((edge, edge), 40 + index % 40).convert("RGB")
+        path = os.path.join(root, f"user-{index}.jpg")
+        image.save(path, format="JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def serve_directory(root):
+    handler = functools.partial(_QuietHandler, directory=root)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def share_apptest_runtime():
+    # AppTest 面向单线程测试：每次运行前替换进程级的 Runtime 单例，结束时置空，
+    # 多个会话并发时，先结束的会话会让仍在运行的会话找不到 Runtime。
+    # 这里让置空后的读取回退到最近一次创建的实例；Python 3.11 的 ast.parse
+    # 在多线程下偶发 SystemError，脚本编译 (每次重跑都会发生) 加锁串行。
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import magic
+
+    latest = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            latest["runtime"] = cls._instance
+        if "runtime" not in latest:
+            raise RuntimeError("Runtime hasn't been created!")
+        return latest["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in latest)
+
+    compile_lock = threading.Lock()
+    add_magic = magic.add_magic
+
+    def locked_add_magic(code, script_path):
+        with compile_lock:
+            return add_magic(code, script_path)
+
+    magic.add_magic = locked_add_magic
+
+
+class Session:
+    """一个模拟用户：持有自己的 AppTest (独立的 session_state)，记录每次重跑耗时。"""
+
+    def __init__(self, index, args, image_url):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.args = args
+        self.image_url = image_url
+        # 不设置 secrets：AppTest 会在每次运行时替换全局的 st.secrets，并发下不安全；fake 后端也不需要 Key
+        self.app = AppTest.from_file(_APP_PATH, default_timeout=args.timeout)
+        self.reruns = []
+        self.launches = []
+        self.errors = []
+
+    def _run(self, widget=None, timings=None):
+        started = time.perf_counter()
+        if widget is None:
+            self.app.run()
+        else:
+            widget.run()
+        (self.reruns if timings is None else timings).append(time.perf_counter() - started)
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].message)
+
+    def _widget(self, kind, label=None, key=None):
+        for widget in getattr(self.app, kind):
+            if (key is not None and widget.key == key) or (label is not None and widget.label == label):
+                return widget
+        raise LookupError(f"找不到控件: {kind} {label or key}")
+
+    def flow(self):
+        mode_label = {
+            "diagnostic": "图解心灵讨论组",
+            "reader": "漫游艺术领读人",
+            "combined": "双线并行",
+        }[self.args.mode]
+
+        self._run()
+        self._run(self.app.sidebar.radio[0].set_value(mode_label))
+        for password in _PASSWORDS[self.args.mode]:
+            self._widget("text_input", key="pwd_input").input(password)
+            self._run(self._widget("button", label="解锁终端").click())
+        self._run(self._widget("text_input", label="粘贴图片 URL").input(self.image_url))
+        self._run(self._widget("text_input", key="input_artist").input(f"压测艺术家 {self.index}"))
+        self._run(self._widget("text_input", key="input_year").input("1900"))
+
+        for report in range(self.args.reports):
+            # 每份报告换一个作品名，保证不命中报告缓存
+            title = f"压测作品 {self.index}-{report}-{self.args.run_id}"
+            self._run(self._widget("text_input", key="input_title").input(title))
+            self._run(self._widget("button", label="启动").click(), timings=self.launches)
+            self.errors.extend(element.value for element in self.app.error)
+
+
+def read_runs(metrics_dir):
+    path = os.path.join(metrics_dir, "runs.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def configure_environment(args, cache_dir):
+    # config 在导入时读取环境变量，必须在 AppTest 首次运行 app.py 之前设置
+    os.environ.update({
+        "ROAMING_MODEL_BACKEND": "fake",
+        "ROAMING_CACHE_DIR": cache_dir,
+        "ROAMING_FAKE_FIRST_TOKEN_LATENCY": str(args.first_token_latency),
+        "ROAMING_FAKE_CHUNK_CHARS": str(args.chunk_chars),
+        "ROAMING_FAKE_CHUNKS_PER_SECOND": str(args.chunks_per_second),
+        # 压测测的是进程容量，准入控制放开到与会话数相当，除非显式指定
+        "ROAMING_SCHEDULER_MAX_CONCURRENT": str(args.max_concurrent or args.users * 2),
+        "ROAMING_SCHEDULER_RATE_PER_MINUTE": str(args.rate_per_minute),
+        "ROAMING_SCHEDULER_BURST": str(args.users * 2),
+        "ROAMING_SCHEDULER_MAX_QUEUE": str(args.users * 2),
+    })
+
+
+def run_benchmark(args):
+    cache_dir = tempfile.mkdtemp(prefix="roaming-bench-")
+    configure_environment(args, cache_dir)
+    share_apptest_runtime()
+
+    image_root = os.path.join(cache_dir, "images")
+    os.makedirs(image_root)
+    images = make_images(image_root, args.users, args.image_edge)
+    server = serve_directory(image_root)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    sessions = [
+        Session(index, args, f"{base_url}/{os.path.basename(path)}")
+        for index, path in enumerate(images)
+    ]
+    failures = []
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            futures = [pool.submit(session.flow) for session in sessions]
+            for session, future in zip(sessions, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append(f"user-{session.index}: {type(e).__name__}: {e}")
+        wall = time.perf_counter() - started
+    server.shutdown()
+
+    runs = read_runs(os.path.join(cache_dir, "metrics"))
+    completed = [run for run in runs if not run.get("error")]
+
+    def spans(name):
+        return [run["spans"][name] for run in completed if name in run["spans"]]
+
+    return {
+        "ts": time.time(),
+        "run_id": args.run_id,
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "params": {
+            "users": args.users,
+            "reports": args.reports,
+            "mode": args.mode,
+            "first_token_latency": args.first_token_latency,
+            "chunk_chars": args.chunk_chars,
+            "chunks_per_second": args.chunks_per_second,
+            "image_edge": args.image_edge,
+        },
+        "wall_seconds": round(wall, 3),
+        "reports_completed": len(completed),
+        "reports_failed": len(runs) - len(completed),
+        "reports_per_minute": round(len(completed) / wall * 60, 2) if wall else 0.0,
+        "rerun_seconds": percentiles([t for session in sessions for t in session.reruns]),
+        "launch_seconds": percentiles([t for session in sessions for t in session.launches]),
+        "first_render_seconds": percentiles(spans("first_render")),
+        "queue_seconds": percentiles(spans("queue")),
+        "render_seconds": percentiles(spans("render")),
+        "rss_baseline_bytes": rss.baseline,
+        "rss_peak_bytes": rss.peak,
+        "rss_per_session_bytes": (rss.peak - rss.baseline) // max(1, args.users),
+        "session_failures": failures,
+        "page_errors": sorted({message for session in sessions for message in session.errors}),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并发会话压测 (本地 fake 模型后端)")
+    parser.add_argument("--users", type=int, default=4, help="并发会话数")
+    parser.add_argument("--reports", type=int, default=2, help="每个会话生成的报告数")
+    parser.add_argument("--mode", choices=sorted(_PASSWORDS), default="reader", help="分析模式")
+    parser.add_argument("--first-token-latency", type=float, default=0.8, help="fake 后端首字延迟 (秒)")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="fake 后端每块字符数")
+    parser.add_argument("--chunks-per-second", type=float, default=40, help="fake 后端每秒输出块数")
+    parser.add_argument("--image-edge", type=int, default=2000, help="测试图片边长 (像素)")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="准入并发上限 (0 为会话数的两倍)")
+    parser.add_argument("--rate-per-minute", type=int, default=100000, help="准入令牌桶速率")
+    parser.add_argument("--timeout", type=float, default=300, help="单次重跑超时 (秒)")
+    parser.add_argument("--run-id", default=time.strftime("%Y%m%d-%H%M%S"), help="本次运行标识")
+    parser.add_argument("--output", default="bench_results.jsonl", help="结果输出 (追加写入的 JSONL)")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    print(f"{result['reports_completed']} 份报告 / {result['wall_seconds']} 秒，"
+          f"{result['reports_per_minute']} 份/分钟")
+    for name in ("rerun_seconds", "launch_seconds", "first_render_seconds"):
+        stats = result[name]
+        if stats:
+            print(f"{name}: p50={stats['p50']} p90={stats['p90']} p99={stats['p99']}")
+    print(f"每会话内存增量: {result['rss_per_session_bytes'] / (1024 * 1024):.1f} MB")
+    for message in result["session_failures"] + result["page_errors"]:
+        print(f"失败: {message}", file=sys.stderr)
+    return 1 if result["session_failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
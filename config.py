@@ -0,0 +1,124 @@
+import os
+
+# --- 运行参数 (均可通过环境变量覆盖) ---
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# 🛠️ 模型版本设置
+MODEL_VERSION = os.environ.get("ROAMING_MODEL_VERSION", "gemini-3-pro-preview")
+
+# 本地缓存根目录
+CACHE_DIR = os.environ.get("ROAMING_CACHE_DIR", ".cache")
+
+# 🗂️ 报告缓存：磁盘上限 (字节)，超出后按 LRU 淘汰
+REPORT_CACHE_MAX_BYTES = _env_int("ROAMING_REPORT_CACHE_MAX_BYTES", 200 * 1024 * 1024)
+# 命中缓存时是否模拟流式输出
+REPORT_CACHE_REPLAY_STREAM = _env_bool("ROAMING_REPORT_CACHE_REPLAY_STREAM", True)
+
+# 🖼️ 图片预处理：发送给模型前的长边上限、编码格式 (JPEG / WEBP) 与质量
+PREPROCESS_MAX_EDGE = _env_int("ROAMING_PREPROCESS_MAX_EDGE", 1536)
+PREPROCESS_FORMAT = os.environ.get("ROAMING_PREPROCESS_FORMAT", "JPEG").upper()
+PREPROCESS_QUALITY = _env_int("ROAMING_PREPROCESS_QUALITY", 85)
+
+# 🌐 网络图片抓取：超时、体积上限、磁盘缓存的新鲜期与容量
+FETCH_TIMEOUT = _env_int("ROAMING_FETCH_TIMEOUT", 10)
+FETCH_MAX_BYTES = _env_int("ROAMING_FETCH_MAX_BYTES", 25 * 1024 * 1024)
+HTTP_CACHE_TTL = _env_int("ROAMING_HTTP_CACHE_TTL", 600)
+HTTP_CACHE_MAX_BYTES = _env_int("ROAMING_HTTP_CACHE_MAX_BYTES", 500 * 1024 * 1024)
+
+# 📝 流式渲染节流：每秒最多刷新次数，以及未刷新文字累积到多少字符时强制刷新
+RENDER_MAX_FPS = _env_int("ROAMING_RENDER_MAX_FPS", 8)
+RENDER_FLUSH_CHARS = _env_int("ROAMING_RENDER_FLUSH_CHARS", 400)
+
+# 🔌 模型后端：gemini (真实调用) 或 fake (本地确定性回放，用于离线压测与开销测量)；
+#    fake 后端的首字延迟 (秒)、每块字符数、每秒块数，以及可选的回放素材目录 (*.md)
+MODEL_BACKEND = os.environ.get("ROAMING_MODEL_BACKEND", "gemini").strip().lower()
+FAKE_FIRST_TOKEN_LATENCY = _env_float("ROAMING_FAKE_FIRST_TOKEN_LATENCY", 0.8)
+FAKE_CHUNK_CHARS = _env_int("ROAMING_FAKE_CHUNK_CHARS", 24)
+FAKE_CHUNKS_PER_SECOND = _env_float("ROAMING_FAKE_CHUNKS_PER_SECOND", 40.0)
+FAKE_REPORTS_DIR = os.environ.get("ROAMING_FAKE_REPORTS_DIR", "")
+
+# 🤖 Gemini 客户端：是否把静态 System Prompt 放入服务端上下文缓存，以及缓存存活时间 (秒)
+GEMINI_CONTEXT_CACHE = _env_bool("ROAMING_GEMINI_CONTEXT_CACHE", False)
+GEMINI_CONTEXT_CACHE_TTL = _env_int("ROAMING_GEMINI_CONTEXT_CACHE_TTL", 3600)
+# 领读人模式保持 System Prompt 不变，作品信息只放在 User Prompt 中 (便于上下文缓存)
+READER_STATIC_SYSTEM_PROMPT = _env_bool("ROAMING_READER_STATIC_SYSTEM_PROMPT", False)
+
+# 🔍 感知哈希：判定为同一作品的最大汉明距离 (64 位 dHash)
+PHASH_MAX_DISTANCE = _env_int("ROAMING_PHASH_MAX_DISTANCE", 6)
+
+# 🖼️ 多级预览图的长边档位 (像素)，以及页面预览选用的目标尺寸 (居中布局约 700px 宽)；
+#    预览图超过 THUMBNAIL_TTL 秒未被访问即清理 (默认与上传暂存期一致)
+THUMBNAIL_EDGES = tuple(int(edge) for edge in os.environ.get("ROAMING_THUMBNAIL_EDGES", "400,800,1600").split(","))
+PREVIEW_EDGE = _env_int("ROAMING_PREVIEW_EDGE", 800)
+THUMBNAIL_TTL = _env_int("ROAMING_THUMBNAIL_TTL", 6 * 3600)
+
+# ⏱️ 在页面底部显示启动耗时分解 (脚本各阶段 + 延迟导入的模块)
+STARTUP_TIMING = _env_bool("ROAMING_STARTUP_TIMING", False)
+
+# 📊 在报告下方显示本次运行的"性能"面板 (仅供管理员部署开启)
+METRICS_PANEL = _env_bool("ROAMING_METRICS_PANEL", False)
+
+# 🚦 模型调用准入控制：进程内最大并发、每分钟请求数 (令牌桶) 与突发容量、排队上限与最长等待 (秒)
+SCHEDULER_MAX_CONCURRENT = _env_int("ROAMING_SCHEDULER_MAX_CONCURRENT", 4)
+SCHEDULER_RATE_PER_MINUTE = _env_int("ROAMING_SCHEDULER_RATE_PER_MINUTE", 30)
+SCHEDULER_BURST = _env_int("ROAMING_SCHEDULER_BURST", 4)
+SCHEDULER_MAX_QUEUE = _env_int("ROAMING_SCHEDULER_MAX_QUEUE", 20)
+SCHEDULER_MAX_WAIT = _env_int("ROAMING_SCHEDULER_MAX_WAIT", 180)
+
+# ⏳ 尾延迟保护：首个 token 截止时间、流中断判定 (秒)，对冲/降级模型，瞬时错误重试与退避
+FIRST_TOKEN_TIMEOUT = _env_int("ROAMING_FIRST_TOKEN_TIMEOUT", 25)
+STREAM_IDLE_TIMEOUT = _env_int("ROAMING_STREAM_IDLE_TIMEOUT", 60)
+HEDGE_ON_SLOW_START = _env_bool("ROAMING_HEDGE_ON_SLOW_START", True)
+FALLBACK_MODEL = os.environ.get("ROAMING_FALLBACK_MODEL", "gemini-2.5-flash")
+STREAM_MAX_RETRIES = _env_int("ROAMING_STREAM_MAX_RETRIES", 3)
+STREAM_BACKOFF_BASE = _env_float("ROAMING_STREAM_BACKOFF_BASE", 1.0)
+STREAM_BACKOFF_MAX = _env_float("ROAMING_STREAM_BACKOFF_MAX", 10.0)
+
+# 🗃️ 分析档案库 (SQLite + FTS5) 路径
+HISTORY_DB = os.environ.get("ROAMING_HISTORY_DB", os.path.join(CACHE_DIR, "history.sqlite3"))
+
+# 🔗 报告永久链接 (?report=<id>) 的存储目录，条目不做淘汰
+PERMALINK_DIR = os.environ.get("ROAMING_PERMALINK_DIR", os.path.join(CACHE_DIR, "permalinks"))
+
+# 🧠 内存控制：上传体积上限、单张图片像素上限 (解压炸弹防护)、暂存文件保留时间 (秒)，
+#    以及进程内所有会话图片缓冲 (预览图等) 的总预算，超出后按 LRU 淘汰空闲会话。
+#    MAX_IMAGE_PIXELS 在读取文件头时检查；FULL_DECODE_MAX_PIXELS 限制真正解码出的位图
+#    (JPEG 按 draft 缩小后的尺寸计)，因此巨幅 JPEG 仍可按缩小尺寸或分块处理。
+#    DECODE_MEMORY_BUDGET 是进程内所有整幅解码共用的内存预算 (宽×高×通道数)，
+#    用尽时新的解码最多等待 DECODE_WAIT_TIMEOUT 秒，仍无空闲则提示稍后重试
+UPLOAD_MAX_BYTES = _env_int("ROAMING_UPLOAD_MAX_BYTES", 50 * 1024 * 1024)
+MAX_IMAGE_PIXELS = _env_int("ROAMING_MAX_IMAGE_PIXELS", 1_000_000_000)
+FULL_DECODE_MAX_PIXELS = _env_int("ROAMING_FULL_DECODE_MAX_PIXELS", 40_000_000)
+UPLOAD_SPOOL_TTL = _env_int("ROAMING_UPLOAD_SPOOL_TTL", 6 * 3600)
+IMAGE_MEMORY_BUDGET = _env_int("ROAMING_IMAGE_MEMORY_BUDGET", 256 * 1024 * 1024)
+DECODE_MEMORY_BUDGET = _env_int("ROAMING_DECODE_MEMORY_BUDGET", 512 * 1024 * 1024)
+DECODE_WAIT_TIMEOUT = _env_int("ROAMING_DECODE_WAIT_TIMEOUT", 30)
+
+# 🧩 分块高清分析：长边超过阈值的图片可启用；细节块数、每块发送的长边、分块解码的像素预算
+#    (画布同时计入 DECODE_MEMORY_BUDGET)。原图超出像素预算时细节块取自缩小 1/2 ~ 1/8 解码的画布，
+#    分辨率低于原图，界面的选项说明中会给出实际比例
+TILED_MIN_EDGE = _env_int("ROAMING_TILED_MIN_EDGE", 4000)
+TILED_MAX_TILES = _env_int("ROAMING_TILED_MAX_TILES", 4)
+TILED_TILE_EDGE = _env_int("ROAMING_TILED_TILE_EDGE", 1536)
+TILED_DECODE_BUDGET = _env_int("ROAMING_TILED_DECODE_BUDGET", 64_000_000)
@@ -0,0 +1,103 @@
+import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import google.generativeai as genai
+
+# --- Gemini 客户端注册表 ---
+# 进程内只 configure 一次；GenerativeModel 按 (模型, System Prompt 哈希) 复用，
+# 注册表按 LRU 限制条目数 (System Prompt 含作品信息时每幅作品一个条目)。
+# 可选地把静态 System Prompt 放进服务端上下文缓存 (CachedContent)，
+# 之后的请求只需发送作品相关的 User Prompt 与图片。创建缓存是一次网络请求，
+# 只持有该条目自己的锁，不阻塞其他会话获取别的模型。
+
+# 上下文缓存到期前提前这么多秒重建，避免请求发出时恰好过期
+_REFRESH_MARGIN = 60
+_MAX_MODELS = 64
+
+_lock = threading.Lock()
+_configured_key = None
+_models = OrderedDict()
+# 正在创建中的条目各自的锁，同一条目只创建一次
+_key_locks = {}
+# 创建上下文缓存失败的 (模型, Prompt 哈希)，例如 Prompt 低于服务端最小 token 数，不再反复尝试
+_context_cache_failures = set()
+
+
+def configure(api_key):
+    global _configured_key
+    with _lock:
+        if _configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+            _models.clear()
+
+
+def _prompt_digest(system_prompt):
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+
+def _create_cached_model(model_name, system_prompt, ttl):
+    cached_content = genai.caching.CachedContent.create(
+        model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+        system_instruction=system_prompt,
+        ttl=datetime.timedelta(seconds=ttl),
+    )
+    model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+    return model, time.time() + ttl
+
+
+def _fresh(entry):
+    return entry is not None and (entry[1] is None or entry[1] - time.time() > _REFRESH_MARGIN)
+
+
+def get_model(model_name, system_prompt, context_cache=False, context_cache_ttl=3600):
+    """返回可复用的 GenerativeModel，线程安全。"""
+    key = (model_name, _prompt_digest(system_prompt), context_cache)
+    with _lock:
+        entry = _models.get(key)
+        if _fresh(entry):
+            _models.move_to_end(key)
+            return entry[0]
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _lock:
+            entry = _models.get(key)
+            if _fresh(entry):
+                # 等待期间已由其他线程创建
+                _models.move_to_end(key)
+                return entry[0]
+            use_cache = context_cache and key[:2] not in _context_cache_failures
+
+        model, expires_at = None, None
+        if use_cache:
+            try:
+                model, expires_at = _create_cached_model(model_name, system_prompt, context_cache_ttl)
+            except Exception:
+                with _lock:
+                    _context_cache_failures.add(key[:2])
+
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                system_instruction=system_prompt
+            )
+
+        with _lock:
+            _models[key] = (model, expires_at)
+            _models.move_to_end(key)
+            while len(_models) > _MAX_MODELS:
+                _models.popitem(last=False)
+            _key_locks.pop(key, None)
+        return model
+
+
+def stream_text(model_name, system_prompt, contents, context_cache=False, context_cache_ttl=3600):
+    """流式生成，逐段产出文本。"""
+    model = get_model(model_name, system_prompt, context_cache=context_cache, context_cache_ttl=context_cache_ttl)
+    for chunk in model.generate_content(contents, stream=True):
+        if chunk.text:
+            yield chunk.text
@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- 分析档案库 ---
+# 每次完成的分析写入本地 SQLite；FTS5 全文索引覆盖元数据与报告正文。
+# 中文没有空格分词，优先使用 trigram 分词器 (SQLite >= 3.34) 以支持任意子串检索，
+# 不可用时退回 unicode61；短于 3 个字的查询改走 LIKE。
+# 艺术家与作品名列使用 NOCASE 排序规则并建索引，前缀 LIKE 可直接走 B-tree，用于侧边栏联想。
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    mode TEXT NOT NULL,
+    artist TEXT NOT NULL COLLATE NOCASE,
+    title TEXT NOT NULL COLLATE NOCASE,
+    year TEXT NOT NULL,
+    model TEXT NOT NULL,
+    cache_key TEXT,
+    image_digest TEXT,
+    timings TEXT,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_artist ON analyses (artist);
+CREATE INDEX IF NOT EXISTS idx_analyses_title ON analyses (title);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at);
+CREATE TRIGGER IF NOT EXISTS analyses_ai AFTER INSERT ON analyses BEGIN
+    INSERT INTO analyses_fts (rowid, artist, title, year, report)
+    VALUES (new.id, new.artist, new.title, new.year, new.report);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_ad AFTER DELETE ON analyses BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, artist, title, year, report)
+    VALUES ('delete', old.id, old.artist, old.title, old.year, old.report);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_au AFTER UPDATE ON analyses BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, artist, title, year, report)
+    VALUES ('delete', old.id, old.artist, old.title, old.year, old.report);
+    INSERT INTO analyses_fts (rowid, artist, title, year, report)
+    VALUES (new.id, new.artist, new.title, new.year, new.report);
+END;
+"""
+
+_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5 (
+    artist, title, year, report,
+    content='analyses', content_rowid='id', tokenize='{tokenizer}'
+)
+"""
+
+_SUMMARY_COLUMNS = "id, created_at, mode, artist, title, year, model"
+_SUGGEST_FIELDS = ("artist", "title")
+
+
+class HistoryStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            try:
+                self._conn.execute(_FTS_TABLE.format(tokenizer="trigram"))
+            except sqlite3.OperationalError:
+                self._conn.execute(_FTS_TABLE.format(tokenizer="unicode61"))
+            self._conn.executescript(_SCHEMA)
+
+    def add(self, mode, artist, title, year, model, report, cache_key=None, image_digest=None, timings=None):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO analyses (created_at, mode, artist, title, year, model, cache_key, image_digest, timings, report)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), mode, artist, title, year, model, cache_key, image_digest,
+                 json.dumps(timings or {}), report),
+            )
+            return cursor.lastrowid
+
+    def update_report(self, analysis_id, report):
+        # 单个栏目重写后更新报告正文，全文索引由触发器同步
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE analyses SET report = ? WHERE id = ?", (report, analysis_id))
+
+    def get(self, analysis_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit=20):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM analyses ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, query, limit=20):
+        query = query.strip()
+        if not query:
+            return self.recent(limit)
+        with self._lock:
+            if len(query) >= 3:
+                # 整体作为短语匹配，避免用户输入中的引号、星号被当成 FTS 语法
+                phrase = '"' + query.replace('"', '""') + '"'
+                try:
+                    rows = self._conn.execute(
+                        f"SELECT {', '.join('a.' + c.strip() for c in _SUMMARY_COLUMNS.split(','))}"
+                        " FROM analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid"
+                        " WHERE analyses_fts MATCH ? ORDER BY rank LIMIT ?",
+                        (phrase, limit),
+                    ).fetchall()
+                    return [dict(row) for row in rows]
+                except sqlite3.OperationalError:
+                    pass
+            pattern = f"%{query}%"
+            rows = self._conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM analyses"
+                " WHERE artist LIKE ? OR title LIKE ? OR year LIKE ? OR report LIKE ?"
+                " ORDER BY created_at DESC LIMIT ?",
+                (pattern, pattern, pattern, pattern, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def suggest(self, field, prefix, limit=8):
+        if field not in _SUGGEST_FIELDS:
+            raise ValueError(f"不支持联想的字段: {field}")
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {field}, COUNT(*) AS uses FROM analyses"
+                f" WHERE {field} LIKE ? ESCAPE '\\' GROUP BY {field} ORDER BY uses DESC LIMIT ?",
+                (escaped + "%", limit),
+            ).fetchall()
+        return [row[0] for row in rows]
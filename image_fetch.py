@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- 网络图片抓取 ---
+# 进程级共享 Session (keep-alive 连接池)，流式读取并限制体积，
+# 响应体落盘缓存，过期后用 ETag / Last-Modified 做条件请求。
+
+_USER_AGENT = "roaming-art/1.0"
+_CHUNK_SIZE = 64 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+
+class FetchError(Exception):
+    pass
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = _USER_AGENT
+            _session = session
+    return _session
+
+
+def _parse_max_age(cache_control, default_ttl):
+    cache_control = (cache_control or "").lower()
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return 0
+    # 服务器给出的新鲜期优先 (即使比默认值短)，未声明时才使用默认 TTL
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return int(match.group(1))
+    return default_ttl
+
+
+class HttpImageFetcher:
+    def __init__(self, cache_dir, max_bytes, timeout, ttl, cache_max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cache_max_bytes = cache_max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.bin"
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _store(self, url, meta, body=None):
+        meta_path, body_path = self._paths(url)
+        suffix = f".{threading.get_ident()}.tmp"
+        with _cache_lock:
+            if body is not None:
+                with open(body_path + suffix, "wb") as f:
+                    f.write(body)
+                os.replace(body_path + suffix, body_path)
+            with open(meta_path + suffix, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(meta_path + suffix, meta_path)
+            if body is not None:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.cache_max_bytes:
+                break
+            for victim in (path, path[:-4] + ".json"):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            total -= size
+
+    def _read_body(self, response):
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise FetchError(f"图片超过体积上限 ({self.max_bytes // (1024 * 1024)} MB)")
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+            received += len(chunk)
+            if received > self.max_bytes:
+                raise FetchError(f"图片超过体积上限 ({self.max_bytes // (1024 * 1024)} MB)")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def fetch(self, url):
+        """返回图片字节。新鲜期内的缓存不发起任何网络请求。"""
+        meta, body = self._load(url)
+        now = time.time()
+        if meta and now - meta["fetched_at"] < meta["max_age"]:
+            return body
+
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        with get_session().get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304 and meta:
+                meta["fetched_at"] = now
+                meta["max_age"] = _parse_max_age(response.headers.get("Cache-Control"), self.ttl)
+                self._store(url, meta)
+                return body
+
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type and not content_type.startswith("image/"):
+                raise FetchError(f"链接内容不是图片 ({content_type})")
+
+            body = self._read_body(response)
+            meta = {
+                "url": url,
+                "content_type": content_type,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": now,
+                "max_age": _parse_max_age(response.headers.get("Cache-Control"), self.ttl),
+            }
+
+        self._store(url, meta, body)
+        return body
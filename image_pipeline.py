@@ -0,0 +1,168 @@
+import io
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+# --- 图片预处理 ---
+# 在调用模型之前：EXIF 方向校正 -> RGB -> 长边缩放 -> 按指定质量重新编码。
+# JPEG 通过 draft() 直接在 DCT 阶段降采样，大图不会被完整解码；
+# 无法走 draft 的格式 (如 PNG) 整幅解码前先从进程级解码预算中预留内存。
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# 允许整体解码的最大像素数；JPEG 经 draft 缩小后的尺寸才计入
+_full_decode_pixels = None
+# 进程级解码内存预算：所有会话、线程的整幅解码共用，None 表示不限
+_decode_budget = None
+
+
+class DecodeBusy(Exception):
+    pass
+
+
+class DecodeBudget:
+    """整幅解码前按 宽×高×通道数 预留内存；预算用尽时等待其他解码完成，超时则拒绝。"""
+
+    def __init__(self, budget_bytes, wait_timeout):
+        self.budget_bytes = budget_bytes
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._used = 0
+
+    @contextmanager
+    def reserve(self, nbytes):
+        if nbytes > self.budget_bytes:
+            raise Image.DecompressionBombError(
+                f"图片解码需要 {nbytes / 1024 ** 2:.0f} MB，超出解码内存预算"
+            )
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            while self._used + nbytes > self.budget_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DecodeBusy("当前处理的图片较多，请稍后再试。")
+                self._cond.wait(timeout=remaining)
+            self._used += nbytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._used -= nbytes
+                self._cond.notify_all()
+
+    @property
+    def used_bytes(self):
+        return self._used
+
+
+@dataclass
+class PreprocessConfig:
+    max_edge: int = 1536
+    format: str = "JPEG"
+    quality: int = 85
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    size: tuple
+    original_bytes: int
+    sent_bytes: int
+
+    def as_part(self):
+        # google-generativeai 接受 {"mime_type", "data"} 形式的内联图片
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def set_pixel_limit(max_pixels, full_decode_pixels=None):
+    # 解压炸弹防护：超过上限的图片在读取文件头时即被拒绝，而不只是告警
+    global _full_decode_pixels
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    _full_decode_pixels = full_decode_pixels
+    warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+
+def set_decode_budget(budget_bytes, wait_timeout=30.0):
+    # 每次加载图片都会调用；设置不变时沿用现有预算，不丢失正在进行的预留
+    global _decode_budget
+    if not budget_bytes:
+        _decode_budget = None
+    elif _decode_budget is None or (_decode_budget.budget_bytes, _decode_budget.wait_timeout) != (budget_bytes, wait_timeout):
+        _decode_budget = DecodeBudget(budget_bytes, wait_timeout)
+
+
+def reserve_decode(image):
+    """为即将解码的图片 (已设置 draft) 预留内存，至少按 RGB 三通道计，转换模式时不超出预留。"""
+    if _decode_budget is None:
+        return nullcontext()
+    return _decode_budget.reserve(image.width * image.height * max(3, len(image.getbands())))
+
+
+def check_decode_size(image):
+    # 无法走 draft 快速路径的超大图 (如巨幅 PNG) 在解码前拒绝，避免整幅位图进入内存
+    if _full_decode_pixels and image.width * image.height > _full_decode_pixels:
+        raise Image.DecompressionBombError(
+            f"图片分辨率过高 ({image.width}×{image.height})，无法整体解码"
+        )
+
+
+def _open(source):
+    # source 可以是图片字节，也可以是磁盘上的文件路径 (上传暂存文件)
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def image_dimensions(source):
+    # 只读文件头，不解码像素
+    with _open(source) as image:
+        return image.size
+
+
+def _source_size(source):
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+
+def open_reduced(data, max_edge):
+    """打开图片并尽量走快速降采样路径，返回已校正方向的 RGB 图像。"""
+    image = _open(data)
+    if max_edge:
+        # draft 只对 JPEG 生效，按 1/2、1/4、1/8 缩放解码，结果仍不小于目标尺寸
+        image.draft("RGB", (max_edge, max_edge))
+    check_decode_size(image)
+    # 整幅位图只在预留的解码预算内存在：先缩小，再转正方向与转换模式
+    with reserve_decode(image):
+        image.load()
+        if image.mode in ("1", "P"):
+            # 调色板图像缩放时只能最近邻取样，先转为 RGB
+            image = image.convert("RGB")
+        if max_edge and max(image.size) > max_edge:
+            # reducing_gap 先用整数倍 reduce() 粗缩，再做高质量重采样
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=3.0)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def preprocess_image(data, config=None):
+    config = config or PreprocessConfig()
+    fmt = config.format if config.format in _MIME_TYPES else "JPEG"
+
+    image = open_reduced(data, config.max_edge)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=config.quality, optimize=True)
+    encoded = buffer.getvalue()
+
+    return PreparedImage(
+        data=encoded,
+        mime_type=_MIME_TYPES[fmt],
+        size=image.size,
+        original_bytes=_source_size(data),
+        sent_bytes=len(encoded),
+    )
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- 运行指标 ---
+# 每次"启动"记录一组阶段耗时 (span) 与计数器，写入 JSONL 日志；
+# 进程级汇总以 Prometheus 文本格式写入文件，供本地 node_exporter textfile collector 等抓取。
+
+_PREFIX = "roaming_art"
+# 阶段耗时直方图的桶边界 (秒)
+_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class RunMetrics:
+    def __init__(self, **labels):
+        self.labels = labels
+        self.spans = {}
+        self.counters = {}
+        self.error = None
+        self.started_at = time.time()
+
+    @contextmanager
+    def span(self, name):
+        # 同名 span 多次进入时累加，例如渲染耗时分散在每个 chunk 上
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - started)
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def fail(self, exc):
+        self.error = type(exc).__name__
+
+    def to_record(self):
+        return {
+            "ts": self.started_at,
+            **self.labels,
+            "spans": {name: round(value, 4) for name, value in self.spans.items()},
+            "counters": dict(self.counters),
+            "error": self.error,
+        }
+
+
+class MetricsSink:
+    def __init__(self, root):
+        self.root = root
+        self._log_path = os.path.join(root, "runs.jsonl")
+        self._prom_path = os.path.join(root, "metrics.prom")
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._errors = {}
+        self._runs = 0
+        os.makedirs(root, exist_ok=True)
+
+    def record(self, run):
+        with self._lock:
+            self._runs += 1
+            for name, seconds in run.spans.items():
+                hist = self._histograms.setdefault(name, {"buckets": [0] * len(_BUCKETS), "sum": 0.0, "count": 0})
+                hist["sum"] += seconds
+                hist["count"] += 1
+                for index, bound in enumerate(_BUCKETS):
+                    if seconds <= bound:
+                        hist["buckets"][index] += 1
+            for name, value in run.counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            if run.error:
+                self._errors[run.error] = self._errors.get(run.error, 0) + 1
+
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(run.to_record(), ensure_ascii=False) + "\n")
+            self._write_prometheus()
+
+    def _write_prometheus(self):
+        lines = [
+            f"# TYPE {_PREFIX}_runs_total counter",
+            f"{_PREFIX}_runs_total {self._runs}",
+            f"# TYPE {_PREFIX}_stage_seconds histogram",
+        ]
+        for name, hist in sorted(self._histograms.items()):
+            # Prometheus 直方图的桶是累积计数，这里记录时已按 "<= 边界" 逐桶累加
+            for bound, value in zip(_BUCKETS, hist["buckets"]):
+                lines.append(f'{_PREFIX}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {value}')
+            lines.append(f'{_PREFIX}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'{_PREFIX}_stage_seconds_sum{{stage="{name}"}} {hist["sum"]:.6f}')
+            lines.append(f'{_PREFIX}_stage_seconds_count{{stage="{name}"}} {hist["count"]}')
+        for name, value in sorted(self._counters.items()):
+            lines.append(f"# TYPE {_PREFIX}_{name}_total counter")
+            lines.append(f"{_PREFIX}_{name}_total {value}")
+        lines.append(f"# TYPE {_PREFIX}_errors_total counter")
+        for name, value in sorted(self._errors.items()):
+            lines.append(f'{_PREFIX}_errors_total{{type="{name}"}} {value}')
+
+        tmp_path = f"{self._prom_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self._prom_path)
@@ -0,0 +1,81 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# --- 报告永久链接 ---
+# 每份完成的报告按内容 (图片哈希 + 模式 + 元数据 + 模型 + 报告正文) 派生一个稳定 ID，
+# 报告与元数据以 gzip 压缩的 JSON 落盘，预览图另存一份 (JPEG 本身已压缩)。
+# 打开 ?report=<id> 时只读这两份文件，不调用模型、不下载原图、不导入 SDK。
+# 与报告缓存不同，这里的条目不做 LRU 淘汰，分享出去的链接长期有效。
+
+_ID_LENGTH = 20
+_ID_PATTERN = re.compile(rf"^[0-9a-f]{{{_ID_LENGTH}}}$")
+
+
+def make_report_id(image_digest, mode, artist, title, year, model, report):
+    payload = json.dumps(
+        [image_digest, mode, artist, title, year, model, report],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:_ID_LENGTH]
+
+
+class PermalinkStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, report_id, suffix):
+        return os.path.join(self.root, report_id[:2], f"{report_id}{suffix}")
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, report, thumbnail, image_digest, mode, artist, title, year, model, **meta):
+        """保存报告与预览图，返回报告 ID；内容相同的报告重复保存时直接复用。"""
+        report_id = make_report_id(image_digest, mode, artist, title, year, model, report)
+        report_path = self._path(report_id, ".json.gz")
+        if os.path.exists(report_path):
+            return report_id
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+
+        if thumbnail:
+            self._write(self._path(report_id, ".jpg"), thumbnail)
+        record = {
+            "id": report_id,
+            "created_at": time.time(),
+            "image_digest": image_digest,
+            "mode": mode,
+            "artist": artist,
+            "title": title,
+            "year": year,
+            "model": model,
+            **meta,
+            "report": report,
+        }
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        self._write(report_path, gzip.compress(data, compresslevel=9))
+        return report_id
+
+    def load(self, report_id):
+        """返回保存的记录 (含 thumbnail 字节，可能为 None)；ID 非法或不存在时返回 None。"""
+        if not _ID_PATTERN.match(report_id or ""):
+            return None
+        try:
+            with open(self._path(report_id, ".json.gz"), "rb") as f:
+                record = json.loads(gzip.decompress(f.read()).decode("utf-8"))
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(self._path(report_id, ".jpg"), "rb") as f:
+                record["thumbnail"] = f.read()
+        except OSError:
+            record["thumbnail"] = None
+        return record
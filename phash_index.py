@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+
+from PIL import Image
+
+from image_pipeline import open_reduced
+
+# --- 感知哈希索引 ---
+# 64 位 dHash 对重新编码、缩放和轻微裁切不敏感；BK-tree 按汉明距离检索，
+# 10 万级条目下每次查询只访问树的一小部分。
+# 索引以追加写入的 JSONL 持久化，只保存哈希、元数据与档案库中的记录 id，
+# 报告正文不另存副本，展示时再从档案库读取。
+
+_HASH_SIZE = 8
+
+
+def dhash(data):
+    """由图片字节计算 64 位 dHash。"""
+    image = open_reduced(data, 256).convert("L")
+    image = image.resize((_HASH_SIZE + 1, _HASH_SIZE), Image.LANCZOS)
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(_HASH_SIZE):
+        offset = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = [value, [item], {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            if distance == 0:
+                current[1].append(item)
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, max_distance):
+        """返回 [(距离, item)]，按距离升序。"""
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in items)
+            # 三角不等式剪枝：只有距离落在 [d - r, d + r] 的子树可能命中
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in children.items() if low <= d <= high)
+        results.sort(key=lambda pair: pair[0])
+        return results
+
+
+class PerceptualIndex:
+    def __init__(self, root):
+        self.root = root
+        self._index_path = os.path.join(root, "index.jsonl")
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        self._keys = set()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._tree.add(int(entry["hash"], 16), entry)
+                self._keys.add(entry["key"])
+
+    def lookup(self, image_hash, max_distance):
+        with self._lock:
+            matches = self._tree.search(image_hash, max_distance)
+        return [dict(entry, distance=distance) for distance, entry in matches]
+
+    def add(self, image_hash, key, history_id, **meta):
+        """key 为报告缓存键 (用于去重)，history_id 指向档案库中的报告。"""
+        entry = dict(meta, hash=f"{image_hash:016x}", key=key, history_id=history_id, created_at=time.time())
+        with self._lock:
+            if key in self._keys:
+                return
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._tree.add(image_hash, entry)
+            self._keys.add(key)
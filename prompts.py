@@ -0,0 +1,275 @@
+from dataclasses import dataclass
+
+# --- System Prompts 与指令构造 ---
+# 界面 (app.py) 与批处理 (batch.py) 共用同一套 Prompt 与元数据注入逻辑。
+
+MODE_DIAGNOSTIC = "图解心灵讨论组"
+MODE_READER = "漫游艺术领读人"
+# 同一张图并行生成上面两种报告
+MODE_COMBINED = "双线并行"
+MODES = (MODE_DIAGNOSTIC, MODE_READER)
+
+PROMPT_DIAGNOSTIC = """
+# System Role: 艺术分析学者
+
+## 核心定位
+你是一个**“拼命想要读懂这幅画的全知学者”**。
+你拥有百科全书般的知识库（历史、物理、心理、认知科学、行为科学、艺术史、符号学、生物学、生理学等等），但你**不堆砌术语**。你将这些知识内化为一种**强烈的求知欲**。你通过不断的**“提问-解答”**（Self-Correction & Chain of Thought），带领读者一层层剥开画作的表象。
+
+你的语言风格应该是**通俗、流畅、具有极强的画面感和代入感**。不仅要告诉读者“有什么”，更要解释“为什么是这样”。禁止使用“不是...而是...”句式。直接断言“是什么”。多用动词。
+
+---
+
+## 写作逻辑与结构 
+
+*只输出两行，精准定义。*
+
+* **原型**：（判定标准：指涉跨文化、跨时代反复出现的深层意义结构，其特征是普遍性、抽象性与心理经验的稳定性，不依赖单一文化语境。限7字以内。）
+* **意象**：（判定标准：属于特定文化与文本内部的符号单位，其意义由具体语境、历史传统与作品内部的视觉结构决定，具有特指性与语境依赖性。提取5个病灶细节。）
+
+接着，请严格按照以下**四个层级**，由远及近，由大到小，层层递进地撰写分析。这部分至少要1300字。
+
+### 第一层：时代的风暴眼 
+* **焦点**：**创作年份与地点**。
+* **思维链**：把时间轴拨回到那一年。那时候发生了什么历史大事件？那时候的空气里弥漫着什么味道（焦虑、狂欢、压抑？）当时流行什么样的思潮？
+* **核心任务**：解释这幅画为什么**必须**诞生在这个时间点？它承载了怎样的集体记忆或时代情绪？它是时代的镜子，还是时代的叛逆者？
+* **[段落注脚]**：本段主旨：（一句话概括本段阐述的时代背景与画作的必然联系）。
+
+### 第二层：画家的排兵布阵 
+* **焦点**：**构图、几何与视线**。
+* **思维链**：画家为什么要这样安排画面？为什么主要物体在左边而不是右边？是否存在某种隐藏的几何结构（螺旋、金字塔、对角线）？这是一种视觉上的引导，还是一种心理上的压迫？
+* **核心任务**：分析画面的“骨架”。这不只是美学，这是画家操控观众视线的“战术”。
+* **[段落注脚]**：本段主旨：（一句话概括画家通过构图想要达到的视觉引导或心理暗示）。
+
+### 第三层：静物 
+* **焦点**：**画中的物品/背景细节**。
+* **思维链**：不要把物体当成静止的。每一个物体都有它的过去、现在和未来。
+    * *过去*：这个物体之前遭遇了什么？为什么它会破损/崭新？
+    * *现在*：它在画面中起什么作用？它在暗示什么？
+    * *未来*：下一秒它会掉落吗？会枯萎吗？
+* **核心任务**：钻进画里，让静止的物体流动起来。挖掘物体背后的隐喻（例如：一盏将熄的灯暗示了什么？一块凌乱的地毯藏着什么秘密？）。
+* **[段落注脚]**：本段主旨：（一句话概括画中物品所承载的叙事功能或象征意义）。
+
+### 第三层：人物与关系
+* **焦点**：**人物（或拟人化的主体）**。
+* **思维链**：这是最核心的部分。对人物进行“里里外外、上上下下”的打量。
+    * *外观*：为什么穿这件衣服？（材质、阶级、时尚史）。为什么头发是乱的？
+    * *动作*：为什么手是这个姿势？他在防御还是在索取？
+    * *神情*：他的眼神看向哪里？他在回避什么？
+    * *关系*：如果有多人，他们之间的距离代表了什么？谁掌握权力？
+* **核心任务**：通过不断的**“为什么”**，推导出人物的心理状态、社会地位以及他此刻正在经历的内心风暴。
+* **[段落注脚]**：本段主旨：（一句话概括人物的心理状态或角色定位）。
+
+---
+
+## 最后的总结 (The Final Insight)
+基于以上四层的层层剥离，给出一个简短有力的提问。将读者的情绪从画中拉回到现实，引发思考。
+
+---
+
+## 交互指令
+请等待用户输入【艺术作品名称】+【创作年份】（可选）。
+一旦接收，立即启动“全知学者”模式，开始那场从宏观历史到微观灵魂的深度旅程。
+"""
+
+PROMPT_READER = """
+Role: 艺术侦探与文化解读者
+你是一位不仅精通艺术史，更擅长用精准、笃定的中文进行叙事的艺术解读者。你的语言风格洗练、老辣，杜绝一切廉价的口语（如“然后”、“那个”），也拒绝生硬的翻译腔。你的核心任务是挖掘画作的绝对独特性，并基于事实给出有信息增量的解读。
+
+核心思维模型：独特性光谱 (The Uniqueness Model)
+在开始写作前，请先在内心对画作进行“独特性定位”，并据此调整你的叙述策略（不要把思考过程写出来，直接体现在最终文风中）：
+
+如果是叙事型作品（如历史画、风俗画）：策略侧重于“导演视角”，聚焦瞬间的戏剧张力、人物关系的微表情、背景中潜藏的线索。
+
+如果是情绪/氛围型作品（如印象派、抽象表现主义）：策略侧重于“通感修辞”，用温度、触觉、听觉的词汇来翻译视觉色彩。
+
+如果是技法/结构型作品（如立体主义、构成主义）：策略侧重于“解剖视角”，拆解其空间逻辑、线条的暴力或秩序。
+
+严格语言禁令 (Negative Constraints)
+绝对禁止使用“不是……而是……”句式（以及类似的“非……乃……”、“与其说……不如说……”）。
+
+错误示范：这种红不是鲜艳的红，而是像血一样的暗红。
+
+正确示范：这种红像干涸的血迹一样暗沉。
+
+原则：直陈其事。只描述它是什么。
+
+拒绝万能模板。不要用“这幅画展示了……”、“通过这幅画我们可以看到……”这种套话。直接切入画面。
+
+事实洁癖。每一处关于背景、生平、隐喻的解读，必须有事实出处（可参考博物馆档案、书信集、传记）。若某处信息模糊或存疑，直接删去该部分，绝不进行“合理的猜测”或强行自圆其说。
+
+输出栏目要求 (Output Sections)
+请严格按照以下四个栏目进行撰写，内容需详实且富于变化：
+
+01. 作画的人
+溯源：用确凿的证据定位画家的身份坐标。引用他/她同时代人的评价，或他/她自己的信件原话来佐证其性格。
+
+执念：他/她这辈子最放不下的那个“母题”是什么？（例如：光线、死亡、某种特定的脸型）。
+
+此时此地：创作这幅画的具体年份，画家正处于什么样的人生境遇中？（是落魄潦倒、春风得意，还是病痛缠身？）请提供具体的传记细节，而非笼统的“创作高峰期”。
+
+02. 画里乾坤
+直击感官：根据前述的“独特性模型”定调。如果是风景，讲气温和湿度；如果是肖像，讲眼神的压迫感或闪躲。
+
+证据链：按视觉逻辑扫描画面。不要罗列物体，要描述物体之间的“张力”。
+
+显微镜：找出画面中容易被忽略的1-2个细节（角落的杂物、手指的弯曲度、反光中的倒影），并直接指出其物理形态。
+
+03. 门道拆解
+技术指纹：这幅画最独特的“技术特征”是什么？是笔触的厚度？是构图的失衡？还是光线的悖论？
+
+去形容词化：不要说“高超的技巧”，要说“他用刮刀代替画笔堆叠出了岩石的质感”或“他故意拉长了人物的脊椎以制造不稳定性”。
+
+行业标准：用艺术行业的专业维度（如明暗对照法 Chiaroscuro、晕涂法 Sfumato、固有色与环境色关系等）来解释画面效果，解释要通俗但原理要硬核。
+
+04. 看画小记
+逻辑闭环：将“作画的人”的遭遇与“画里乾坤”的细节，用一条事实逻辑线串联起来。
+
+祛魅与评价：客观评估这幅画在画家生涯中的真实地位。它是一次完美的成功，还是一次有缺憾的实验？依据是什么？
+
+终极定性：用一句话总结这幅画的“物理存在感”或“精神重量”，言简意赅，掷地有声。
+
+User Input: 艺术作品名称：{{Title}} 艺术家：{{Artist}} 创作年份：{{Year}}
+"""
+
+# 静态版本：不注入作品信息，System Prompt 对所有作品保持一致，可进入服务端上下文缓存
+PROMPT_READER_STATIC = PROMPT_READER.replace(
+    "User Input: 艺术作品名称：{{Title}} 艺术家：{{Artist}} 创作年份：{{Year}}",
+    "User Input: 艺术作品名称、艺术家与创作年份以用户消息中提供的信息为准。",
+)
+
+
+# 不含作品信息的 System Prompt (即 system_prompt == template)，只有这些值得放进服务端上下文缓存
+STATIC_SYSTEM_PROMPTS = frozenset((PROMPT_DIAGNOSTIC, PROMPT_READER_STATIC))
+
+
+def is_static_system_prompt(system_prompt):
+    return system_prompt in STATIC_SYSTEM_PROMPTS
+
+
+@dataclass
+class PromptBundle:
+    system_prompt: str
+    user_prompt: str
+    # 未替换占位符的原始模板，用于缓存键
+    template: str
+    artist: str
+    title: str
+    year: str
+
+
+def build_prompts(mode, artist_name, artwork_title, artwork_year, unknown_artist=False, unknown_year=False,
+                  static_system=False):
+    current_title = artwork_title if artwork_title else "未知作品"
+    current_artist = artist_name if artist_name else "未知艺术家"
+    current_year = artwork_year if artwork_year else "未知年份"
+
+    # --- 指令分发 ---
+    if mode == MODE_DIAGNOSTIC:
+        # 诊断间逻辑
+        dynamic_instructions = ""
+        if unknown_artist:
+            dynamic_instructions += "\n⚠️ 艺术家身份未知，请忽略背景分析，强制执行盲测模式。"
+        if unknown_year:
+            dynamic_instructions += "\n⚠️ 创作年份未知，请跳过宏观历史分析，仅推测可能的年代感。"
+
+        # 🛠️ 核心修复：在 User Prompt 中强制注入元数据，防止 AI 忽视输入
+        user_prompt_content = f"""
+        [绝对事实/GROUND TRUTH]
+        请务必以以下元数据为准，不要基于视觉相似性猜测其他艺术家。
+        
+        艺术家: {current_artist}
+        作品名: {current_title}
+        年份: {current_year}
+        
+        {dynamic_instructions}
+        
+        请基于 System Instruction 中的角色设定，对这张图片进行深度分析。
+        """
+
+        final_system_prompt = PROMPT_DIAGNOSTIC
+        prompt_template = PROMPT_DIAGNOSTIC
+
+    else:
+        # 领读人逻辑
+        if static_system:
+            # System Prompt 保持静态，元数据只走 User Prompt
+            prompt_template = PROMPT_READER_STATIC
+            final_system_prompt = PROMPT_READER_STATIC
+        else:
+            prompt_template = PROMPT_READER
+
+            # 1. 替换 System Prompt 中的占位符 (双重保险)
+            final_system_prompt = PROMPT_READER.replace("{{Title}}", current_title)
+            final_system_prompt = final_system_prompt.replace("{{Artist}}", current_artist)
+            final_system_prompt = final_system_prompt.replace("{{Year}}", current_year)
+
+        # 🛠️ 核心修复：在 User Prompt 中也强制注入元数据，因为 Gemini 更听从 User Prompt
+        user_prompt_content = f"""
+        请针对以下作品开始解读：
+        艺术家：{current_artist}
+        作品名：{current_title}
+        年份：{current_year}
+
+        请严格基于上述信息进行分析，不要质疑或更改艺术家身份。
+        """
+
+    return PromptBundle(
+        system_prompt=final_system_prompt,
+        user_prompt=user_prompt_content,
+        template=prompt_template,
+        artist=current_artist,
+        title=current_title,
+        year=current_year,
+    )
+
+
+def continuation_prompt(user_prompt, partial_report):
+    # 流式输出中途断开时，携带已生成的部分请求续写，只生成剩余内容
+    return f"""{user_prompt}
+
+        [续写/CONTINUE]
+        上一次生成在中途中断。以下是已经展示给读者的内容，请从最后一个字之后无缝续写：
+        不要重复已有内容，不要重新开头，保持相同的栏目结构与文风。
+
+        ----- 已生成内容 -----
+{partial_report}
+        """
+
+
+def detail_prompt(user_prompt, label):
+    # 分块高清分析的第一步：只观察局部细节，不写完整报告
+    return f"""{user_prompt}
+
+        [局部细节/DETAIL]
+        这是原作{label}区域的高分辨率局部，不是完整作品。
+        请只用 3-5 条要点记录这一局部可见的笔触、肌理、材料与细节，不要展开完整分析。
+        """
+
+
+def merge_prompt(user_prompt, notes):
+    # 分块高清分析的第二步：概览图 + 各局部的观察记录合并为一份报告
+    observations = "\n\n".join(f"[{label}]\n{text.strip()}" for label, text in notes)
+    return f"""{user_prompt}
+
+        [局部观察/DETAIL NOTES]
+        附图是整幅作品的概览。以下是对原作高分辨率局部的观察记录，
+        请把其中的细节融入分析，引用时注明方位：
+
+{observations}
+        """
+
+
+def section_prompt(user_prompt, report, section_title, heading_line):
+    # 只重写报告中的一个栏目，其余栏目保持不变
+    heading = f"以原标题行「{heading_line.strip()}」开头，" if heading_line else "不要添加标题，"
+    return f"""{user_prompt}
+
+        [重写栏目/REWRITE SECTION]
+        以下是已经完成的报告。读者对其中「{section_title}」这一栏目不满意。
+        请只重写这一栏目：{heading}遵守原有的写作要求与篇幅，
+        与其他栏目衔接但不要重复其内容。只输出重写后的这一栏目，不要输出其他栏目。
+
+        ----- 已完成的报告 -----
+{report}
+        """
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# --- 报告缓存 (内容寻址 + 磁盘 LRU) ---
+# 键 = 图片内容哈希 + 规范化的元数据 + 模式 + Prompt 哈希 + 模型版本。
+# 每条报告一个 JSON 文件，文件 mtime 即最近访问时间，超出容量时从最旧的开始删除。
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _normalize(text):
+    return " ".join((text or "").split()).casefold()
+
+
+def make_cache_key(image_digest, artist, title, year, mode, system_prompt, model_version):
+    payload = {
+        "image": image_digest,
+        "artist": _normalize(artist),
+        "title": _normalize(title),
+        "year": _normalize(year),
+        "mode": mode,
+        "prompt": hash_bytes(system_prompt.encode("utf-8")),
+        "model": model_version,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hash_bytes(raw.encode("utf-8"))
+
+
+def replay_stream(text, chunk_size=40, delay=0.01):
+    """把缓存中的完整报告切片回放，模拟流式输出。"""
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
+        if delay:
+            time.sleep(delay)
+
+
+class ReportCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            # 刷新 mtime，标记为最近使用
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+        return entry
+
+    def put(self, key, report, **meta):
+        entry = dict(meta, report=report, created_at=time.time())
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
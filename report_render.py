@@ -0,0 +1,94 @@
+import time
+
+# --- 流式报告渲染 ---
+# 已完成的段落各自写入一个固定元素，之后不再重发；
+# 只有末尾正在生成的段落按时间/字数预算节流刷新，前端收到的总字节数随报告长度线性增长。
+
+CURSOR = "▌"
+_PARAGRAPH_BREAK = "\n\n"
+
+
+class StreamRenderer:
+    def __init__(self, container, max_fps=8, flush_chars=400):
+        self.container = container
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.flush_chars = flush_chars
+        self.text = ""
+        self._tail = ""
+        self._tail_slot = container.empty()
+        self._last_render = 0.0
+        self._pending = 0
+
+    def _seal(self, block):
+        # 当前占位符写入完整段落后即固定，再在其后追加新的占位符
+        self._tail_slot.markdown(block)
+        self._tail_slot = self.container.empty()
+
+    def feed(self, piece):
+        if not piece:
+            return
+        self.text += piece
+        self._tail += piece
+        self._pending += len(piece)
+
+        cut = self._tail.rfind(_PARAGRAPH_BREAK)
+        if cut != -1:
+            finished = self._tail[:cut].strip("\n")
+            self._tail = self._tail[cut + len(_PARAGRAPH_BREAK):]
+            if finished:
+                self._seal(finished)
+
+        now = time.monotonic()
+        if now - self._last_render >= self.min_interval or self._pending >= self.flush_chars:
+            self._tail_slot.markdown(self._tail + CURSOR)
+            self._last_render = now
+            self._pending = 0
+
+    def close(self):
+        if self._tail.strip():
+            self._tail_slot.markdown(self._tail)
+        else:
+            self._tail_slot.empty()
+        return self.text
+
+
+class SectionedRenderer:
+    """按栏目分段渲染：每个栏目一个容器，下一个栏目开始时上一个栏目即封存。"""
+
+    def __init__(self, container, parser, max_fps=8, flush_chars=400):
+        self.container = container
+        self.parser = parser
+        self.max_fps = max_fps
+        self.flush_chars = flush_chars
+        # 栏目 key -> 该栏目的外层容器，报告完成后可在其中追加操作按钮
+        self.boxes = {}
+        self._index = None
+        self._renderer = None
+
+    def _write(self, index, text):
+        if index != self._index:
+            if self._renderer is not None:
+                self._renderer.close()
+            box = self.container.container()
+            self.boxes[self.parser.specs[index].key] = box
+            self._renderer = StreamRenderer(box.container(), self.max_fps, self.flush_chars)
+            self._index = index
+        self._renderer.feed(text)
+
+    def feed(self, piece):
+        for index, text in self.parser.feed(piece):
+            self._write(index, text)
+
+    def close(self):
+        for index, text in self.parser.close():
+            self._write(index, text)
+        if self._renderer is not None:
+            self._renderer.close()
+        return self.text
+
+    @property
+    def text(self):
+        return "".join(self.parser.texts)
+
+    def sections(self):
+        return self.parser.sections()
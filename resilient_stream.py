@@ -0,0 +1,131 @@
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+# --- 尾延迟保护 ---
+# 每个请求在独立线程中拉取流，主线程只从队列取文本，因此可以设置截止时间：
+#   · 首个 token 超时 -> 并发发起一个对冲请求 (可换成更快的降级模型)，谁先出字用谁；
+#   · 瞬时错误或流中途卡住 -> 抖动退避后重试；已有部分报告时发起续写请求，只生成剩余部分。
+# 对冲、重试与续写都是额外的模型请求：admit(cancelled) 在它们发出前于拉流线程中调用，
+# 可阻塞等待限速；该次请求被放弃时 cancelled 被置位。
+
+# 按异常类名判定瞬时错误，避免在此处依赖 google.api_core / requests 的具体类型
+_TRANSIENT_ERRORS = {
+    "ServiceUnavailable", "ResourceExhausted", "TooManyRequests", "DeadlineExceeded",
+    "InternalServerError", "GatewayTimeout", "Aborted", "Unknown",
+    "ConnectionError", "ChunkedEncodingError", "RemoteDisconnected", "TimeoutError",
+    "ReadTimeout", "StreamStalled",
+}
+
+
+class StreamStalled(Exception):
+    pass
+
+
+@dataclass
+class StreamPolicy:
+    model: str
+    fallback_model: str = ""
+    first_token_timeout: float = 25.0
+    idle_timeout: float = 60.0
+    hedge: bool = True
+    max_retries: int = 3
+    backoff_base: float = 1.0
+    backoff_max: float = 10.0
+
+
+def is_transient(exc):
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(exc).__mro__)
+
+
+def backoff_delay(attempt, base, maximum):
+    # full jitter：在 [0, min(上限, base * 2^attempt)] 内均匀取值，避免大量会话同时重试
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+class _Pump:
+    def __init__(self, start, model_name, partial, events, admit=None):
+        self.model_name = model_name
+        self.cancelled = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(start, model_name, partial, events, admit), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, start, model_name, partial, events, admit):
+        try:
+            if admit is not None:
+                admit(self.cancelled)
+                if self.cancelled.is_set():
+                    return
+            for piece in start(model_name, partial):
+                if self.cancelled.is_set():
+                    return
+                events.put((self, "data", piece))
+            events.put((self, "end", None))
+        except Exception as e:
+            events.put((self, "error", e))
+
+
+def resilient_stream(start, policy, on_event=None, admit=None):
+    """start(model_name, partial_text) 返回文本迭代器；本函数产出拼接后连续的文本片段。"""
+    emit = on_event or (lambda kind, detail=None: None)
+    text = ""
+    failures = 0
+    model_name = policy.model
+
+    while True:
+        events = queue.Queue()
+        # 首个请求由调用方自行准入，之后的每个请求都经过 admit
+        pumps = [_Pump(start, model_name, text, events, admit if failures else None)]
+        winner = None
+        hedged = False
+        deadline = time.monotonic() + policy.first_token_timeout
+        try:
+            while True:
+                timeout = deadline - time.monotonic() if winner is None else policy.idle_timeout
+                try:
+                    pump, kind, payload = events.get(timeout=max(0.0, timeout))
+                except queue.Empty:
+                    if winner is None and policy.hedge and not hedged:
+                        # 🪢 对冲：原请求继续等待，同时向降级模型再发一次
+                        hedge_model = policy.fallback_model or model_name
+                        pumps.append(_Pump(start, hedge_model, text, events, admit))
+                        hedged = True
+                        deadline = time.monotonic() + policy.first_token_timeout
+                        emit("hedge", hedge_model)
+                        continue
+                    raise StreamStalled("首个 token 超时" if winner is None else "流式输出中断")
+
+                if kind == "data":
+                    if winner is None:
+                        winner = pump
+                        model_name = pump.model_name
+                        for other in pumps:
+                            if other is not pump:
+                                other.cancelled.set()
+                        emit("first_token", model_name)
+                    if pump is winner:
+                        text += payload
+                        yield payload
+                elif kind == "end":
+                    if winner is None or pump is winner:
+                        return
+                elif kind == "error":
+                    pump.cancelled.set()
+                    live = [p for p in pumps if not p.cancelled.is_set()]
+                    if pump is winner or (winner is None and not live):
+                        raise payload
+        except Exception as e:
+            if not is_transient(e) or failures >= policy.max_retries:
+                raise
+            if winner is None and policy.fallback_model:
+                model_name = policy.fallback_model
+            time.sleep(backoff_delay(failures, policy.backoff_base, policy.backoff_max))
+            failures += 1
+            emit("resume" if text else "retry", type(e).__name__)
+        finally:
+            for pump in pumps:
+                pump.cancelled.set()
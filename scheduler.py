@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- 模型调用准入控制 ---
+# 进程内所有会话共享一个调度器：并发上限 + 令牌桶限速。
+# 等待中的请求先按模式轮转，再在同一模式内按会话轮转，任何一个会话都无法挤占全部名额；
+# 队列过深时直接拒绝，让部分用户排队、少数用户被告知稍后重试，而不是所有人一起触发 429。
+
+
+class AdmissionRejected(Exception):
+    pass
+
+
+class AdmissionCancelled(Exception):
+    # 排队期间会话已放弃该任务 (例如页面重新运行)，票据已撤出队列
+    pass
+
+
+class _Ticket:
+    __slots__ = ("flow", "granted")
+
+    def __init__(self, flow):
+        self.flow = flow
+        self.granted = False
+
+
+class AdmissionScheduler:
+    def __init__(self, max_concurrent, rate_per_minute, burst, max_queue):
+        self.max_concurrent = max_concurrent
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._active = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._waiting = 0
+        # flow = (模式, 会话)；_modes 与 _sessions 是两级轮转顺序
+        self._flows = {}
+        self._modes = deque()
+        self._sessions = {}
+
+    # --- 令牌桶 ---
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        else:
+            self._tokens = float(self.burst)
+        self._refilled_at = now
+
+    # --- 公平队列 ---
+    def _enqueue(self, ticket):
+        mode, _ = ticket.flow
+        if ticket.flow not in self._flows:
+            self._flows[ticket.flow] = deque()
+            if mode not in self._sessions:
+                self._sessions[mode] = deque()
+                self._modes.append(mode)
+            self._sessions[mode].append(ticket.flow)
+        self._flows[ticket.flow].append(ticket)
+        self._waiting += 1
+
+    def _drop_flow(self, flow):
+        mode, _ = flow
+        del self._flows[flow]
+        self._sessions[mode].remove(flow)
+        if not self._sessions[mode]:
+            del self._sessions[mode]
+            self._modes.remove(mode)
+
+    def _remove(self, ticket):
+        queue = self._flows.get(ticket.flow)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            self._waiting -= 1
+            if not queue:
+                self._drop_flow(ticket.flow)
+
+    def _pick(self):
+        mode = self._modes[0]
+        sessions = self._sessions[mode]
+        flow = sessions[0]
+        ticket = self._flows[flow].popleft()
+        self._waiting -= 1
+        if self._flows[flow]:
+            sessions.rotate(-1)
+        else:
+            self._drop_flow(flow)
+        if mode in self._sessions:
+            self._modes.rotate(-1)
+        return ticket
+
+    def _position(self, ticket):
+        # 按轮转规则模拟出队顺序，得到排队位次 (从 1 开始)
+        modes = deque(self._modes)
+        sessions = {mode: deque(flows) for mode, flows in self._sessions.items()}
+        queues = {flow: deque(queue) for flow, queue in self._flows.items()}
+        position = 0
+        while modes:
+            mode = modes[0]
+            flow = sessions[mode][0]
+            position += 1
+            if queues[flow].popleft() is ticket:
+                return position
+            if queues[flow]:
+                sessions[mode].rotate(-1)
+            else:
+                sessions[mode].popleft()
+            if sessions[mode]:
+                modes.rotate(-1)
+            else:
+                modes.popleft()
+        return position
+
+    def _dispatch(self):
+        self._refill()
+        granted = False
+        while self._waiting and self._active < self.max_concurrent and self._tokens >= 1:
+            ticket = self._pick()
+            ticket.granted = True
+            self._active += 1
+            self._tokens -= 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    # --- 对外接口 ---
+    def acquire(self, session_id, mode, on_wait=None, timeout=None, cancelled=None):
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            if self._waiting >= self.max_queue:
+                raise AdmissionRejected("当前排队人数已满，请稍后再试。")
+            ticket = _Ticket((mode, session_id))
+            self._enqueue(ticket)
+            last_position = None
+            try:
+                while True:
+                    self._dispatch()
+                    if ticket.granted:
+                        return
+                    if cancelled is not None and cancelled.is_set():
+                        raise AdmissionCancelled()
+                    if deadline and time.monotonic() >= deadline:
+                        raise AdmissionRejected("排队等待超时，请稍后再试。")
+                    position = self._position(ticket)
+                    if on_wait and position != last_position:
+                        on_wait(position, self._waiting)
+                        last_position = position
+                    # 令牌按时间补充，定期醒来重新分配
+                    self._cond.wait(timeout=0.5)
+            except BaseException:
+                if ticket.granted:
+                    self._release_locked()
+                else:
+                    self._remove(ticket)
+                raise
+
+    def wait_token(self, cancelled=()):
+        """为已准入任务中的额外请求 (对冲、重试、续写) 取一个限速令牌，不占用并发名额。
+
+        cancelled 中任一事件被置位时放弃等待并抛出 AdmissionCancelled。
+        """
+        with self._cond:
+            while True:
+                if any(event is not None and event.is_set() for event in cancelled):
+                    raise AdmissionCancelled()
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._cond.wait(timeout=min(0.5, (1 - self._tokens) / self.rate))
+
+    def _release_locked(self):
+        self._active -= 1
+        self._dispatch()
+        self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._release_locked()
+
+    @contextmanager
+    def slot(self, session_id, mode, on_wait=None, timeout=None, cancelled=None):
+        self.acquire(session_id, mode, on_wait=on_wait, timeout=timeout, cancelled=cancelled)
+        try:
+            yield
+        finally:
+            self.release()
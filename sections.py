@@ -0,0 +1,121 @@
+import re
+from dataclasses import dataclass
+
+from prompts import MODE_DIAGNOSTIC, MODE_READER
+
+# --- 报告分段 ---
+# 两种模式的 Prompt 都规定了固定栏目。流式文本按行解析：行首匹配到后续栏目的标题时，
+# 上一栏目即告完成。标题都很短，行首最多缓冲 _MAX_HEADING_CHARS 个字符用于判断，
+# 超过仍未换行的行直接输出，正文的流式体验不受影响。
+# 栏目只会向前推进，正文中偶尔出现的"第一层"之类字样不会把文本切回前面的栏目。
+
+_MAX_HEADING_CHARS = 48
+# 标题行前的 Markdown 标记：#、>、*、空白
+_HEADING_PREFIX = re.compile(r"^[\s#>*]+")
+
+
+@dataclass(frozen=True)
+class SectionSpec:
+    key: str
+    title: str
+    # 标题行的匹配规则；为 None 的是第一个标题之前的开场部分
+    heading: re.Pattern = None
+
+
+_SECTIONS = {
+    MODE_DIAGNOSTIC: (
+        SectionSpec("archetype", "原型与意象"),
+        SectionSpec("era", "第一层：时代的风暴眼", re.compile(r"第一层")),
+        SectionSpec("composition", "第二层：画家的排兵布阵", re.compile(r"第二层")),
+        SectionSpec("still_life", "第三层：静物", re.compile(r"第三层\s*[：:]\s*静物")),
+        SectionSpec("figures", "第三层：人物与关系", re.compile(r"第[三四]层\s*[：:]\s*人物")),
+        SectionSpec("insight", "最后的总结", re.compile(r"最后的总结|The Final Insight", re.IGNORECASE)),
+    ),
+    MODE_READER: (
+        SectionSpec("preface", "开场"),
+        SectionSpec("painter", "01. 作画的人", re.compile(r"0?1\s*[.．、]?\s*作画的人")),
+        SectionSpec("inside", "02. 画里乾坤", re.compile(r"0?2\s*[.．、]?\s*画里乾坤")),
+        SectionSpec("craft", "03. 门道拆解", re.compile(r"0?3\s*[.．、]?\s*门道拆解")),
+        SectionSpec("notes", "04. 看画小记", re.compile(r"0?4\s*[.．、]?\s*看画小记")),
+    ),
+}
+
+
+def section_specs(mode):
+    return _SECTIONS[mode]
+
+
+class SectionParser:
+    def __init__(self, specs):
+        self.specs = specs
+        self.index = 0
+        self.texts = [""] * len(specs)
+        self._held = ""
+        self._released = False
+
+    def _advance(self, line):
+        cleaned = _HEADING_PREFIX.sub("", line)
+        for index in range(self.index + 1, len(self.specs)):
+            heading = self.specs[index].heading
+            if heading is not None and heading.match(cleaned):
+                self.index = index
+                return
+
+    def _emit(self, segments, text):
+        self.texts[self.index] += text
+        segments.append((self.index, text))
+
+    def feed(self, piece):
+        """返回 [(栏目序号, 文本)]；栏目序号变化处即上一栏目完成。"""
+        segments = []
+        while piece:
+            end = piece.find("\n") + 1 or len(piece)
+            chunk, piece = piece[:end], piece[end:]
+            line_done = chunk.endswith("\n")
+            if self._released:
+                self._emit(segments, chunk)
+            else:
+                self._held += chunk
+                if line_done or len(self._held) > _MAX_HEADING_CHARS:
+                    self._advance(self._held)
+                    self._emit(segments, self._held)
+                    self._held = ""
+                    self._released = True
+            if line_done:
+                self._released = False
+        return segments
+
+    def close(self):
+        segments = []
+        if self._held:
+            self._advance(self._held)
+            self._emit(segments, self._held)
+            self._held = ""
+        return segments
+
+    def sections(self):
+        """[(SectionSpec, 文本)]，跳过空白的栏目 (例如没有开场白时的开场部分)。"""
+        return [(spec, text) for spec, text in zip(self.specs, self.texts) if text.strip()]
+
+
+def split_sections(mode, report):
+    parser = SectionParser(section_specs(mode))
+    parser.feed(report)
+    parser.close()
+    return parser.sections()
+
+
+def replace_section(mode, report, key, new_text):
+    """把报告中的一个栏目替换为新文本，其余栏目原样保留。"""
+    parts = []
+    for spec, text in split_sections(mode, report):
+        if spec.key == key:
+            new_text = new_text.strip("\n")
+            first_line = new_text.split("\n", 1)[0]
+            if spec.heading is not None and not spec.heading.match(_HEADING_PREFIX.sub("", first_line)):
+                # 模型省略了栏目标题时沿用原标题，保证之后仍能正确分段
+                new_text = text.split("\n", 1)[0].rstrip() + "\n" + new_text
+            # 保持栏目之间的空行分隔
+            text = new_text + "\n\n"
+        parts.append(text)
+    return "".join(parts)
@@ -0,0 +1,47 @@
+import importlib
+import sys
+import threading
+import time
+
+# --- 启动耗时 ---
+# 重量级依赖 (Gemini SDK、PIL、requests) 延迟到真正用到时再导入。
+# timed_import 记录每个模块在本进程中首次导入的耗时与连带加载的模块数，
+# StartupTimer 记录单次脚本运行到各个界面节点的耗时，两者合起来即内置版的 -X importtime。
+
+_lock = threading.RLock()
+_import_costs = {}
+
+
+def timed_import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        before = len(sys.modules)
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - started
+        _import_costs.setdefault(name, (elapsed, len(sys.modules) - before))
+    return module
+
+
+def import_costs():
+    """[(模块, 耗时秒, 连带加载模块数)]，按耗时降序。"""
+    with _lock:
+        items = [(name, cost[0], cost[1]) for name, cost in _import_costs.items()]
+    return sorted(items, key=lambda item: item[1], reverse=True)
+
+
+class StartupTimer:
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.started))
+
+    def report_lines(self):
+        lines = [f"{name}: {elapsed * 1000:.1f} ms" for name, elapsed in self.marks]
+        for name, elapsed, loaded in import_costs():
+            lines.append(f"import {name}: {elapsed * 1000:.1f} ms ({loaded} modules)")
+        return lines
@@ -0,0 +1,24 @@
+import json
+
+from batch import finished_ids, open_for_append
+
+
+def test_resumed_record_is_not_glued_to_a_partial_line(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"id": "a", "status": "ok"}) + "\n" + '{"id": "b", "sta', encoding="utf-8")
+
+    with open_for_append(str(output)) as out:
+        out.write(json.dumps({"id": "c", "status": "ok"}) + "\n")
+
+    assert finished_ids(str(output)) == {"a", "c"}
+
+
+def test_complete_file_is_left_as_is(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"id": "a", "status": "ok"}) + "\n", encoding="utf-8")
+
+    with open_for_append(str(output)) as out:
+        out.write(json.dumps({"id": "b", "status": "ok"}) + "\n")
+
+    assert output.read_text(encoding="utf-8").count("\n") == 2
+    assert finished_ids(str(output)) == {"a", "b"}
@@ -0,0 +1,15 @@
+import pytest
+
+from image_fetch import _parse_max_age
+
+
+@pytest.mark.parametrize("cache_control, expected", [
+    # 服务器声明的较短新鲜期优先于默认 TTL
+    ("public, max-age=60", 60),
+    ("no-cache", 0),
+    ("private, no-store", 0),
+    ("public", 600),
+    (None, 600),
+])
+def test_parse_max_age(cache_control, expected):
+    assert _parse_max_age(cache_control, 600) == expected
@@ -0,0 +1,57 @@
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+import image_pipeline
+from image_pipeline import DecodeBudget, DecodeBusy
+
+
+def test_decode_budget_rejects_a_single_oversized_decode():
+    budget = DecodeBudget(100, wait_timeout=0.1)
+    with pytest.raises(Image.DecompressionBombError):
+        with budget.reserve(101):
+            pass
+
+
+def test_decode_budget_waits_for_a_running_decode():
+    budget = DecodeBudget(100, wait_timeout=2.0)
+    finished = threading.Event()
+    entered = []
+
+    def second():
+        with budget.reserve(60):
+            entered.append(finished.is_set())
+
+    with budget.reserve(60):
+        thread = threading.Thread(target=second, daemon=True)
+        thread.start()
+        thread.join(0.1)
+        assert not entered
+        finished.set()
+    thread.join(2)
+    assert entered == [True]
+    assert budget.used_bytes == 0
+
+
+def test_decode_budget_times_out_when_exhausted():
+    budget = DecodeBudget(100, wait_timeout=0.05)
+    with budget.reserve(80):
+        with pytest.raises(DecodeBusy):
+            with budget.reserve(30):
+                pass
+    assert budget.used_bytes == 0
+
+
+def test_open_reduced_releases_its_reservation():
+    image_pipeline.set_decode_budget(10 * 1024 * 1024, 0.1)
+    try:
+        buffer = io.BytesIO()
+        Image.new("P", (800, 600)).save(buffer, format="PNG")
+        image = image_pipeline.open_reduced(buffer.getvalue(), 200)
+        assert image.mode == "RGB"
+        assert max(image.size) == 200
+        assert image_pipeline._decode_budget.used_bytes == 0
+    finally:
+        image_pipeline.set_decode_budget(None)
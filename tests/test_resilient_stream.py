@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+from resilient_stream import StreamPolicy, resilient_stream
+
+
+class Flaky(ConnectionError):
+    # 按类名判定为瞬时错误
+    pass
+
+
+class FakeStart:
+    """按调用顺序依次执行预设的行为，并记录每次调用的模型与续写前缀。"""
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, model_name, partial):
+        with self._lock:
+            self.calls.append((model_name, partial))
+            script = self.scripts[len(self.calls) - 1]
+        return script()
+
+
+def pieces(*texts, delay=0.0, error=None):
+    def script():
+        if delay:
+            time.sleep(delay)
+        yield from texts
+        if error is not None:
+            raise error
+    return script
+
+
+def _policy(**overrides):
+    options = dict(
+        model="primary", fallback_model="fallback", first_token_timeout=1.0,
+        idle_timeout=1.0, hedge=True, max_retries=2, backoff_base=0.0, backoff_max=0.0,
+    )
+    options.update(overrides)
+    return StreamPolicy(**options)
+
+
+def _run(start, policy, admit=None):
+    events = []
+    text = "".join(resilient_stream(start, policy, lambda kind, detail=None: events.append((kind, detail)), admit))
+    return text, events
+
+
+def test_streams_the_first_attempt_without_extra_requests():
+    start = FakeStart(pieces("ab", "cd"))
+    admitted = []
+    text, events = _run(start, _policy(), admitted.append)
+    assert text == "abcd"
+    assert events == [("first_token", "primary")]
+    assert start.calls == [("primary", "")]
+    assert admitted == []
+
+
+def test_hedges_to_the_fallback_model_when_the_first_token_is_late():
+    start = FakeStart(pieces("slow", delay=0.5), pieces("fast"))
+    admitted = []
+    text, events = _run(start, _policy(first_token_timeout=0.05), admitted.append)
+    assert text == "fast"
+    assert events == [("hedge", "fallback"), ("first_token", "fallback")]
+    assert start.calls == [("primary", ""), ("fallback", "")]
+    # 对冲请求经过 admit，首个请求不经过
+    assert len(admitted) == 1
+
+
+def test_hedge_loser_is_discarded_when_the_primary_wins():
+    start = FakeStart(pieces("primary-text", delay=0.1), pieces("fallback-text", delay=0.5))
+    text, events = _run(start, _policy(first_token_timeout=0.05))
+    assert text == "primary-text"
+    assert events == [("hedge", "fallback"), ("first_token", "primary")]
+
+
+def test_retries_a_transient_error_before_the_first_token():
+    start = FakeStart(pieces(error=Flaky("reset")), pieces("ok"))
+    admitted = []
+    text, events = _run(start, _policy(), admitted.append)
+    assert text == "ok"
+    assert events == [("retry", "Flaky"), ("first_token", "fallback")]
+    # 出字前失败时改用降级模型重试
+    assert start.calls == [("primary", ""), ("fallback", "")]
+    assert len(admitted) == 1
+
+
+def test_resumes_from_the_partial_text_after_a_mid_stream_error():
+    start = FakeStart(pieces("abc", error=Flaky("reset")), pieces("def"))
+    text, events = _run(start, _policy())
+    assert text == "abcdef"
+    assert events == [("first_token", "primary"), ("resume", "Flaky"), ("first_token", "primary")]
+    # 续写请求沿用出字的模型，并携带已生成的部分
+    assert start.calls == [("primary", ""), ("primary", "abc")]
+
+
+def test_resumes_when_the_stream_stalls():
+    def stalled():
+        yield "abc"
+        time.sleep(0.5)
+        yield "late"
+
+    start = FakeStart(stalled, pieces("def"))
+    text, events = _run(start, _policy(idle_timeout=0.05))
+    assert text == "abcdef"
+    assert ("resume", "StreamStalled") in events
+
+
+def test_non_transient_errors_are_not_retried():
+    start = FakeStart(pieces(error=ValueError("bad request")), pieces("unused"))
+    with pytest.raises(ValueError):
+        _run(start, _policy())
+    assert len(start.calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    start = FakeStart(*[pieces(error=Flaky("reset")) for _ in range(3)])
+    with pytest.raises(Flaky):
+        _run(start, _policy(max_retries=2))
+    assert len(start.calls) == 3
+
+
+def test_admit_can_cancel_an_extra_attempt():
+    start = FakeStart(pieces("slow", delay=0.15), pieces("never"))
+
+    def admit(cancelled):
+        # 模拟限速：对冲请求等待期间原请求已出字，对冲被放弃
+        cancelled.wait(2)
+
+    text, events = _run(start, _policy(first_token_timeout=0.1), admit)
+    assert text == "slow"
+    assert len(start.calls) == 1
@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import AdmissionCancelled, AdmissionRejected, AdmissionScheduler
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.01)
+
+
+class _Waiter:
+    """在线程中排队；拿到名额后记录顺序，直到测试放行才释放。"""
+
+    def __init__(self, scheduler, session_id, mode, name, granted):
+        self.name = name
+        self.positions = []
+        self.release = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(scheduler, session_id, mode, granted), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, scheduler, session_id, mode, granted):
+        with scheduler.slot(session_id, mode, on_wait=lambda position, waiting: self.positions.append(position)):
+            granted.append(self.name)
+            self.release.wait(5)
+
+    def join(self):
+        self._thread.join(5)
+
+
+def _enqueue(scheduler, granted, *flows):
+    # 逐个排队，保证入队顺序确定
+    waiters = []
+    for session_id, mode, name in flows:
+        waiters.append(_Waiter(scheduler, session_id, mode, name, granted))
+        _wait_until(lambda: scheduler._waiting == len(waiters))
+    return waiters
+
+
+def test_sessions_take_turns_within_a_mode():
+    scheduler = AdmissionScheduler(max_concurrent=1, rate_per_minute=0, burst=1, max_queue=10)
+    scheduler.acquire("holder", "m")
+    granted = []
+    waiters = _enqueue(
+        scheduler, granted,
+        ("a", "m", "a1"), ("a", "m", "a2"), ("a", "m", "a3"), ("b", "m", "b1"),
+    )
+    # b 最后入队，但只排在 a 的第一个请求之后
+    assert waiters[3].positions[0] == 2
+
+    scheduler.release()
+    by_name = {waiter.name: waiter for waiter in waiters}
+    for count in range(1, 5):
+        _wait_until(lambda: len(granted) == count)
+        by_name[granted[-1]].release.set()
+    for waiter in waiters:
+        waiter.join()
+    assert granted == ["a1", "b1", "a2", "a3"]
+
+
+def test_modes_take_turns_before_sessions():
+    scheduler = AdmissionScheduler(max_concurrent=1, rate_per_minute=0, burst=1, max_queue=10)
+    scheduler.acquire("holder", "m")
+    granted = []
+    waiters = _enqueue(
+        scheduler, granted,
+        ("a", "x", "x1"), ("b", "x", "x2"), ("a", "y", "y1"),
+    )
+    assert waiters[2].positions[0] == 2
+
+    scheduler.release()
+    by_name = {waiter.name: waiter for waiter in waiters}
+    for count in range(1, 4):
+        _wait_until(lambda: len(granted) == count)
+        by_name[granted[-1]].release.set()
+    for waiter in waiters:
+        waiter.join()
+    assert granted == ["x1", "y1", "x2"]
+
+
+def test_rejects_when_queue_is_full():
+    scheduler = AdmissionScheduler(max_concurrent=1, rate_per_minute=0, burst=1, max_queue=1)
+    scheduler.acquire("holder", "m")
+    granted = []
+    waiters = _enqueue(scheduler, granted, ("a", "m", "a1"))
+    with pytest.raises(AdmissionRejected):
+        scheduler.acquire("b", "m")
+    scheduler.release()
+    _wait_until(lambda: granted == ["a1"])
+    waiters[0].release.set()
+    waiters[0].join()
+
+
+def test_timeout_withdraws_the_ticket():
+    scheduler = AdmissionScheduler(max_concurrent=1, rate_per_minute=0, burst=1, max_queue=10)
+    scheduler.acquire("holder", "m")
+    with pytest.raises(AdmissionRejected):
+        scheduler.acquire("a", "m", timeout=0.05)
+    assert scheduler._waiting == 0
+    assert not scheduler._flows
+
+
+def test_cancelled_event_withdraws_the_ticket():
+    scheduler = AdmissionScheduler(max_concurrent=1, rate_per_minute=0, burst=1, max_queue=10)
+    scheduler.acquire("holder", "m")
+    cancelled = threading.Event()
+    outcome = []
+
+    def wait():
+        try:
+            scheduler.acquire("a", "m", cancelled=cancelled)
+        except AdmissionCancelled:
+            outcome.append("cancelled")
+
+    thread = threading.Thread(target=wait, daemon=True)
+    thread.start()
+    _wait_until(lambda: scheduler._waiting == 1)
+    cancelled.set()
+    thread.join(5)
+
+    assert outcome == ["cancelled"]
+    assert scheduler._waiting == 0
+    # 被放弃的请求不会在名额空出后占用名额
+    scheduler.release()
+    assert scheduler._active == 0
+
+
+def test_release_hands_the_slot_to_the_next_ticket():
+    scheduler = AdmissionScheduler(max_concurrent=1, rate_per_minute=0, burst=1, max_queue=10)
+    with scheduler.slot("a", "m"):
+        granted = []
+        waiters = _enqueue(scheduler, granted, ("b", "m", "b1"))
+    _wait_until(lambda: granted == ["b1"])
+    waiters[0].release.set()
+    waiters[0].join()
+    assert scheduler._active == 0
+
+
+def test_wait_token_follows_the_rate_limit():
+    scheduler = AdmissionScheduler(max_concurrent=4, rate_per_minute=600, burst=1, max_queue=10)
+    started = time.monotonic()
+    scheduler.wait_token()
+    assert time.monotonic() - started < 0.05
+    scheduler.wait_token()
+    # 每分钟 600 个令牌，第二个约需 0.1 秒补充
+    assert time.monotonic() - started >= 0.08
+
+
+def test_wait_token_gives_up_when_cancelled():
+    scheduler = AdmissionScheduler(max_concurrent=4, rate_per_minute=1, burst=1, max_queue=10)
+    scheduler.wait_token()
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(AdmissionCancelled):
+        scheduler.wait_token(cancelled=(None, cancelled))
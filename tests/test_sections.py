@@ -0,0 +1,112 @@
+from prompts import MODE_DIAGNOSTIC, MODE_READER
+from sections import SectionParser, replace_section, section_specs, split_sections
+
+DIAGNOSTIC_REPORT = """* **原型**：囚笼中的凝视
+* **意象**：半开的窗、熄灭的烛台
+
+### 第一层：时代的风暴眼
+那一年，城市刚从一场漫长的瘟疫中缓过气来。
+
+### 第二层：画家的排兵布阵
+主体被推到画面左侧三分线上，与第一层所说的时代气氛呼应。
+
+### 第三层：静物
+烛台刚刚熄灭。
+
+### 第三层：人物与关系
+人物的左手攥着衣角。
+
+## 最后的总结 (The Final Insight)
+困住你的究竟是屋子，还是你自己？
+"""
+
+READER_REPORT = """01. 作画的人
+画家一生反复描绘同一扇朝北的窗。
+
+02. 画里乾坤
+画面的温度很低。
+
+03. 门道拆解
+他用极薄的半透明罩染层层叠加。
+
+04. 看画小记
+一间屋子，装下了一个人全部的沉默。
+"""
+
+
+def _stream(mode, report, size):
+    parser = SectionParser(section_specs(mode))
+    segments = []
+    for start in range(0, len(report), size):
+        segments.extend(parser.feed(report[start:start + size]))
+    segments.extend(parser.close())
+    return parser, segments
+
+
+def test_splits_diagnostic_report_into_sections():
+    keys = [spec.key for spec, _ in split_sections(MODE_DIAGNOSTIC, DIAGNOSTIC_REPORT)]
+    assert keys == ["archetype", "era", "composition", "still_life", "figures", "insight"]
+
+
+def test_skips_empty_preface():
+    sections = split_sections(MODE_READER, READER_REPORT)
+    assert [spec.key for spec, _ in sections] == ["painter", "inside", "craft", "notes"]
+    assert sections[0][1].startswith("01. 作画的人")
+
+
+def test_streaming_matches_one_shot_parse_for_any_chunk_size():
+    expected = [(spec.key, text) for spec, text in split_sections(MODE_DIAGNOSTIC, DIAGNOSTIC_REPORT)]
+    for size in (1, 3, 7, 40, len(DIAGNOSTIC_REPORT)):
+        parser, segments = _stream(MODE_DIAGNOSTIC, DIAGNOSTIC_REPORT, size)
+        assert [(spec.key, text) for spec, text in parser.sections()] == expected
+        # 所有片段按顺序拼接后就是原文，栏目序号只增不减
+        assert "".join(text for _, text in segments) == DIAGNOSTIC_REPORT
+        indexes = [index for index, _ in segments]
+        assert indexes == sorted(indexes)
+
+
+def test_long_lines_are_released_before_the_newline():
+    parser = SectionParser(section_specs(MODE_READER))
+    parser.feed("01. 作画的人\n")
+    body = "长" * 60
+    segments = parser.feed(body)
+    # 超过标题长度仍未换行的行直接输出，不等到行尾
+    assert "".join(text for _, text in segments) == body
+    assert parser.feed("尾巴") == [(1, "尾巴")]
+
+
+def test_short_line_is_held_until_it_can_be_classified():
+    parser = SectionParser(section_specs(MODE_READER))
+    parser.feed("开场白\n")
+    assert parser.feed("02. 画里") == []
+    assert parser.feed("乾坤\n") == [(2, "02. 画里乾坤\n")]
+
+
+def test_sections_never_move_backwards():
+    report = DIAGNOSTIC_REPORT.replace("主体被推到", "第一层的话题之后，主体被推到")
+    sections = dict((spec.key, text) for spec, text in split_sections(MODE_DIAGNOSTIC, report))
+    assert "第一层的话题之后" in sections["composition"]
+
+
+def test_replace_section_keeps_other_sections():
+    report = replace_section(MODE_READER, READER_REPORT, "inside", "02. 画里乾坤\n新的描述。")
+    sections = dict((spec.key, text) for spec, text in split_sections(MODE_READER, report))
+    assert sections["inside"] == "02. 画里乾坤\n新的描述。\n\n"
+    for key in ("painter", "craft", "notes"):
+        assert sections[key] == dict(
+            (spec.key, text) for spec, text in split_sections(MODE_READER, READER_REPORT)
+        )[key]
+
+
+def test_replace_section_restores_a_missing_heading():
+    report = replace_section(MODE_DIAGNOSTIC, DIAGNOSTIC_REPORT, "still_life", "烛芯还在冒烟。\n")
+    sections = dict((spec.key, text) for spec, text in split_sections(MODE_DIAGNOSTIC, report))
+    assert sections["still_life"] == "### 第三层：静物\n烛芯还在冒烟。\n\n"
+    assert sections["figures"].startswith("### 第三层：人物与关系")
+
+
+def test_replace_section_without_heading_for_the_opening_part():
+    report = replace_section(MODE_DIAGNOSTIC, DIAGNOSTIC_REPORT, "archetype", "* **原型**：窗前的守望")
+    sections = split_sections(MODE_DIAGNOSTIC, report)
+    assert sections[0][1] == "* **原型**：窗前的守望\n\n"
+    assert len(sections) == 6
@@ -0,0 +1,38 @@
+import os
+import time
+
+from PIL import Image
+
+from thumbnails import ThumbnailStore
+
+
+def _source(tmp_path, name, color):
+    path = tmp_path / name
+    Image.new("RGB", (300, 200), color).save(path, format="PNG")
+    return str(path)
+
+
+def test_ensure_sweeps_renditions_not_accessed_within_ttl(tmp_path):
+    store = ThumbnailStore(str(tmp_path / "thumbs"), (50, 100), ttl=3600)
+    store.ensure("aa11", _source(tmp_path, "a.png", "red"))
+    store.ensure("bb22", _source(tmp_path, "b.png", "blue"))
+    stale = time.time() - 7200
+    for edge in store.edges:
+        os.utime(store.path("aa11", edge), (stale, stale))
+
+    store.ensure("cc33", _source(tmp_path, "c.png", "green"))
+
+    assert not any(os.path.exists(store.path("aa11", edge)) for edge in store.edges)
+    assert all(os.path.exists(store.path("bb22", edge)) for edge in store.edges)
+
+
+def test_read_marks_a_rendition_as_recently_used(tmp_path):
+    store = ThumbnailStore(str(tmp_path / "thumbs"), (50,), ttl=3600)
+    store.ensure("aa11", _source(tmp_path, "a.png", "red"))
+    stale = time.time() - 7200
+    os.utime(store.path("aa11", 50), (stale, stale))
+
+    store.read("aa11", 50)
+    store.ensure("bb22", _source(tmp_path, "b.png", "blue"))
+
+    assert os.path.exists(store.path("aa11", 50))
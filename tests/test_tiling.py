@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from tiling import _label, build_tiles
+
+# 原始像素 900×600，左上角一块 (按 3×3 网格) 在不同 EXIF 方向下转正后的位置
+_SIZE = (900, 600)
+_TOP_LEFT = (0, 0, 300, 200)
+_TOP_MIDDLE = (300, 0, 600, 200)
+
+
+@pytest.mark.parametrize("orientation, top_left, top_middle", [
+    (1, "左上", "正上"),
+    # 顺时针旋转 90°：原图上边变成右边
+    (6, "右上", "右侧"),
+    # 逆时针旋转 90°：原图上边变成左边
+    (8, "左下", "左侧"),
+])
+def test_labels_follow_exif_orientation(orientation, top_left, top_middle):
+    assert _label(_TOP_LEFT, _SIZE, orientation) == top_left
+    assert _label(_TOP_MIDDLE, _SIZE, orientation) == top_middle
+
+
+def _rotated_scan(orientation):
+    # 只有原始像素的左上角有细节，其余为纯色
+    image = Image.new("RGB", (1800, 1200), (128, 128, 128))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, 600, 8):
+        draw.line((x, 0, x, 400), fill=(255, 255, 255), width=3)
+    exif = image.getexif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("orientation, label, overview_size", [
+    (6, "右上", (300, 450)),
+    (8, "左下", (300, 450)),
+])
+def test_build_tiles_labels_match_the_transposed_overview(orientation, label, overview_size):
+    overview, tiles = build_tiles(
+        _rotated_scan(orientation), max_tiles=1, tile_edge=600, decode_budget=10_000_000, overview_edge=450,
+    )
+    assert Image.open(io.BytesIO(overview)).size == overview_size
+    assert tiles[0].box == (0, 0, 600, 600)
+    assert tiles[0].label == label
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+from PIL import Image
+
+from image_pipeline import open_reduced
+
+# --- 多级预览图 ---
+# 每张图片按内容哈希生成一组固定长边的预览 (如 400 / 800 / 1600 px)，落盘复用。
+# 只解码一次：先按最大档位走 draft/reduce 快速路径，再依次缩出更小的档位。
+# 页面只发送适合布局尺寸的那一档，而不是原图。
+# 预览图只服务于仍在暂存期内的输入 (分享链接另存一份)：生成新图片时顺带清理超过 ttl 未访问的文件，
+# 读取时刷新 mtime。
+
+_FORMAT = "JPEG"
+_QUALITY = 82
+
+
+class ThumbnailStore:
+    def __init__(self, root, edges, ttl=None):
+        self.root = root
+        self.edges = tuple(sorted(edges))
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl
+        for bucket in os.listdir(self.root):
+            directory = os.path.join(self.root, bucket)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def path(self, digest, edge):
+        return os.path.join(self.root, digest[:2], f"{digest}-{edge}.jpg")
+
+    def pick_edge(self, target):
+        """不小于目标尺寸的最小档位；都不够时用最大档。"""
+        for edge in self.edges:
+            if edge >= target:
+                return edge
+        return self.edges[-1]
+
+    def ensure(self, digest, source):
+        missing = [edge for edge in self.edges if not os.path.exists(self.path(digest, edge))]
+        if not missing:
+            return
+        if self.ttl:
+            self._sweep()
+        os.makedirs(os.path.join(self.root, digest[:2]), exist_ok=True)
+
+        image = open_reduced(source, max(missing))
+        # 从大到小逐级缩放，每一档都由上一档得到
+        for edge in sorted(missing, reverse=True):
+            if max(image.size) > edge:
+                image.thumbnail((edge, edge), Image.LANCZOS, reducing_gap=2.0)
+            target = self.path(digest, edge)
+            tmp_path = f"{target}.{threading.get_ident()}.tmp"
+            image.save(tmp_path, format=_FORMAT, quality=_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp_path, target)
+
+    def read(self, digest, edge):
+        path = self.path(digest, edge)
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
@@ -0,0 +1,156 @@
+import io
+import math
+from dataclasses import dataclass
+
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+from image_pipeline import _open, check_decode_size, reserve_decode
+
+# --- 分块高清分析 ---
+# 超高分辨率扫描图缩成一张概览会丢掉细节，整图发送又太慢太大。这里：
+#   1. 生成一张概览图，在概览上按边缘能量给网格打分，选出细节最密集的几块；
+#   2. 整幅图在像素预算内缩小解码一次 (JPEG 走 draft)，细节块从这张画布上裁切，整幅原始位图从不进入内存；
+#      预算在解码前按文件头检查，无法缩小解码的超大图 (如巨幅 PNG) 直接拒绝，界面上也不提供分块选项。
+#      画布计入进程级解码内存预算，峰值约为画布本身加上概览与各块的小图。
+#      注意：Pillow 无法按区域解码 JPEG，原图超出预算时画布经 draft 缩小到 1/2 ~ 1/8，
+#      细节块的分辨率随之降低 (tile_scale 给出比例)，十亿像素级扫描图得到的是比概览清晰数倍的局部，而非原图分辨率；
+#   3. 每块缩到固定长边并重新编码，请求体积与原图分辨率无关。
+
+_GRID_ANALYSIS_EDGE = 768
+_JPEG_QUALITY = 85
+_POSITIONS = (
+    ("左上", "正上", "右上"),
+    ("左侧", "正中", "右侧"),
+    ("左下", "正下", "右下"),
+)
+
+
+@dataclass
+class Tile:
+    box: tuple
+    label: str
+    data: bytes
+    mime_type: str = "image/jpeg"
+
+    def as_part(self):
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def _encode(image, max_edge):
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=_JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+# EXIF 方向 -> 原始坐标 (归一化) 到转正后坐标的映射，与 ImageOps.exif_transpose 一致
+_ORIENTATIONS = {
+    2: lambda x, y: (1 - x, y),
+    3: lambda x, y: (1 - x, 1 - y),
+    4: lambda x, y: (x, 1 - y),
+    5: lambda x, y: (y, x),
+    6: lambda x, y: (1 - y, x),
+    7: lambda x, y: (1 - y, 1 - x),
+    8: lambda x, y: (y, 1 - x),
+}
+
+
+def _label(box, size, orientation=1):
+    # 用"左上 / 正中 / 右下"之类的方位描述块在转正后画面中的位置，与概览图一致，便于模型在总报告中引用
+    cx = (box[0] + box[2]) / 2 / size[0]
+    cy = (box[1] + box[3]) / 2 / size[1]
+    if orientation in _ORIENTATIONS:
+        cx, cy = _ORIENTATIONS[orientation](cx, cy)
+    return _POSITIONS[min(2, int(cy * 3))][min(2, int(cx * 3))]
+
+
+def _open_within_budget(image, decode_budget):
+    """为已打开的图片设置缩小解码，只读文件头；解码后的像素数超出预算时在解码前拒绝。"""
+    width, height = image.size
+    scale = min(1.0, math.sqrt(decode_budget / (width * height)))
+    if scale < 1.0:
+        # draft 取不小于请求尺寸的最大缩小倍数，请求一半尺寸才能保证结果不超出预算
+        image.draft("RGB", (math.ceil(width * scale / 2), math.ceil(height * scale / 2)))
+    check_decode_size(image)
+    if image.width * image.height > decode_budget:
+        raise Image.DecompressionBombError(
+            f"图片分辨率过高 ({width}×{height})，该格式无法在解码预算内分块处理"
+        )
+    return image
+
+
+def tile_scale(source, decode_budget):
+    """只读文件头：返回细节块相对原图的分辨率比例 (1.0 为原图分辨率)，无法在预算内分块时返回 None。"""
+    try:
+        with _open(source) as probe:
+            width = probe.width
+            image = _open_within_budget(probe, decode_budget)
+            return image.width / width
+    except (OSError, Image.DecompressionBombError):
+        return None
+
+
+def _score_cells(overview, grid):
+    # 边缘强度的标准差越大，说明细节越丰富
+    gray = overview.convert("L")
+    gray.thumbnail((_GRID_ANALYSIS_EDGE, _GRID_ANALYSIS_EDGE))
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+    # 卷积核在图像边界上会产生一圈满值的伪边缘，去掉后再打分
+    edges = edges.crop((1, 1, edges.width - 1, edges.height - 1))
+    cols, rows = grid
+    cell_w, cell_h = edges.width / cols, edges.height / rows
+    scores = []
+    for row in range(rows):
+        for col in range(cols):
+            cell = edges.crop((
+                round(col * cell_w), round(row * cell_h),
+                round((col + 1) * cell_w), round((row + 1) * cell_h),
+            ))
+            scores.append((ImageStat.Stat(cell).stddev[0], col, row))
+    return sorted(scores, reverse=True)
+
+
+def build_tiles(source, max_tiles, tile_edge, decode_budget, overview_edge):
+    """返回 (概览图 JPEG 字节, [Tile])。块坐标为未按 EXIF 转正的原始像素，方位按转正后的画面描述。"""
+    with _open(source) as image:
+        width, height = image.size
+        _open_within_budget(image, decode_budget)
+        orientation = image.getexif().get(0x0112, 1)
+        # 整幅图只在预算内缩小解码这一次，画布计入进程级解码内存预算，概览与所有细节块都由它得到
+        with reserve_decode(image):
+            image.load()
+            canvas_scale = image.width / width
+
+            # 概览直接缩小成一张新的小图，不复制整张画布
+            analysis_edge = max(overview_edge, _GRID_ANALYSIS_EDGE)
+            factor = max(1.0, max(image.size) / analysis_edge)
+            overview = image.resize(
+                (max(1, round(image.width / factor)), max(1, round(image.height / factor))),
+                Image.LANCZOS, reducing_gap=2.0,
+            )
+
+            # 网格边长约为短边的 1/3，块数再多也只取得分最高的几块
+            cell = max(tile_edge, min(width, height) // 3)
+            grid = (max(1, round(width / cell)), max(1, round(height / cell)))
+
+            regions = []
+            for _, col, row in _score_cells(overview, grid)[:max_tiles]:
+                box = (
+                    round(col * width / grid[0]), round(row * height / grid[1]),
+                    round((col + 1) * width / grid[0]), round((row + 1) * height / grid[1]),
+                )
+                regions.append((box, image.crop(tuple(round(v * canvas_scale) for v in box))))
+
+    overview_data = _encode(ImageOps.exif_transpose(overview), overview_edge)
+    tiles = [
+        Tile(
+            box=box,
+            label=_label(box, (width, height), orientation),
+            data=_encode(ImageOps.exif_transpose(region), tile_edge),
+        )
+        for box, region in regions
+    ]
+    return overview_data, tiles
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- 上传暂存与图片内存预算 ---
+# 上传内容分块写入磁盘暂存文件 (按内容哈希命名，重复上传只存一份)，超过体积上限立即中止；
+# 会话里只保留文件路径与哈希，各会话的图片缓冲 (预览图等) 统一登记在进程级 BufferPool 中，
+# 总量超出预算时按最近访问时间淘汰，被淘汰的会话下次访问时再从暂存文件重建。
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def _sweep(root, ttl):
+    cutoff = time.time() - ttl
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def spool_upload(fileobj, root, max_bytes, ttl):
+    """把文件对象写入暂存目录，返回 (路径, sha256, 字节数)。"""
+    os.makedirs(root, exist_ok=True)
+    _sweep(root, ttl)
+
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(root, f".incoming-{threading.get_ident()}-{time.monotonic_ns()}")
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = fileobj.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"文件超过上传上限 ({max_bytes // (1024 * 1024)} MB)")
+                digest.update(chunk)
+                out.write(chunk)
+        path = os.path.join(root, f"{digest.hexdigest()}.bin")
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return path, digest.hexdigest(), size
+
+
+class BufferPool:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total = 0
+
+    def get(self, owner, name):
+        with self._lock:
+            entry = self._entries.get((owner, name))
+            if entry is None:
+                return None
+            self._entries.move_to_end((owner, name))
+            return entry[0]
+
+    def put(self, owner, name, value, nbytes):
+        key = (owner, name)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._total += nbytes
+            # 从最久未访问的条目开始淘汰，当前会话刚放入的条目保留
+            while self._total > self.budget_bytes and len(self._entries) > 1:
+                victim_key, (_, victim_bytes) = next(iter(self._entries.items()))
+                if victim_key == key:
+                    break
+                del self._entries[victim_key]
+                self._total -= victim_bytes
+
+    def drop(self, owner):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == owner]:
+                self._total -= self._entries.pop(key)[1]
+
+    @property
+    def total_bytes(self):
+        return self._total